@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from copy import copy
+import numpy  # type: ignore # pylint: disable=import-error
+
+PIN, PINNED, ROLLER = 0, 1, 2  # joint kinds, indices in Truss.JOINTS
+
+
+class TrussArrays:  # pylint: disable=too-many-instance-attributes
+    """
+    Compact (struct-of-arrays) representation of truss items.
+
+    Joint i has id joint_ids[i], kind kind[i] (PIN, PINNED or ROLLER),
+    coordinates xy[i] and angle angle[i] (meaningful for roller supports
+    only). Beam i links joints beam_ends[i], force i with value
+    force_value[i] and angle force_angle[i] is applied to joint
+    force_joint[i]. Ids are interned strings shared with items. Arrays are
+    read-only, so analysis code may use them without copying.
+    """
+    def __init__(self, joints, beams, forces):
+        self.joint_ids = tuple(j["id"] for j in joints)
+        self.joint_index = {}  # first joint with given id wins
+        for n, joint_id in enumerate(self.joint_ids):
+            self.joint_index.setdefault(joint_id, n)
+        self.beam_ids = tuple(b["id"] for b in beams)
+        self.force_ids = tuple(f["id"] for f in forces)
+        index = self.joint_index
+        self.kind = self.__array((KINDS[j["type"]] for j in joints),
+                                 numpy.int8, len(joints))
+        self.xy = self.__array((c for j in joints for c in (j["x"], j["y"])),
+                               float, 2 * len(joints)).reshape(-1, 2)
+        self.angle = self.__array((j.get("angle", 0) for j in joints),
+                                  float, len(joints))
+        self.beam_ends = self.__array(
+            (index[b[end]] for b in beams for end in ("end1", "end2")),
+            numpy.intp, 2 * len(beams)).reshape(-1, 2)
+        self.force_joint = self.__array((index[f["applied_to"]]
+                                         for f in forces),
+                                        numpy.intp, len(forces))
+        self.force_angle = self.__array((f["angle"] for f in forces), float,
+                                        len(forces))
+        self.force_value = self.__array((f["value"] for f in forces), float,
+                                        len(forces))
+        self.__indices = {}  # "beam_ids" or "force_ids" -> {id: index}
+
+    @classmethod
+    def of_arrays(cls, **fields):
+        """
+        Return TrussArrays with given ids and arrays (all attributes but
+        joint_index, which is built) instead of ones built from items.
+        """
+        arrays = cls.__new__(cls)
+        arrays.joint_index = {}
+        for n, joint_id in enumerate(fields["joint_ids"]):
+            arrays.joint_index.setdefault(joint_id, n)
+        for name, value in fields.items():
+            if isinstance(value, numpy.ndarray):
+                value = numpy.array(value, dtype=DTYPES[name])
+                value.flags.writeable = False
+            setattr(arrays, name, value)
+        arrays.__indices = {}
+        return arrays
+
+    def patched(self, joints=(), beams=(), forces=()):
+        """
+        Return copy in which items with ids of given joints, beams and
+        forces (ids must be unique) are replaced by them. Only arrays of
+        replaced fields are copied, the rest is shared with this one.
+        """
+        patched = copy(self)
+        if joints:
+            kind, xy, angle = self.kind.copy(), self.xy.copy(), \
+                self.angle.copy()
+            for j in joints:
+                n = self.joint_index[j["id"]]
+                kind[n], xy[n], angle[n] = KINDS[j["type"]], \
+                    (j["x"], j["y"]), j.get("angle", 0)
+            patched.kind, patched.xy, patched.angle = \
+                self.__read_only(kind, xy, angle)
+        if beams:
+            beam_ends = self.beam_ends.copy()
+            for b in beams:
+                beam_ends[self.__index("beam_ids", b["id"])] = \
+                    self.joint_index[b["end1"]], self.joint_index[b["end2"]]
+            patched.beam_ends = self.__read_only(beam_ends)[0]
+        if forces:
+            force_joint, force_angle, force_value = self.force_joint.copy(), \
+                self.force_angle.copy(), self.force_value.copy()
+            for f in forces:
+                n = self.__index("force_ids", f["id"])
+                force_joint[n], force_angle[n], force_value[n] = \
+                    self.joint_index[f["applied_to"]], f["angle"], f["value"]
+            patched.force_joint, patched.force_angle, patched.force_value = \
+                self.__read_only(force_joint, force_angle, force_value)
+        return patched
+
+    def __index(self, ids, item_id):
+        """Return index of item_id in ids tuple (shared by patched copies)."""
+        index = self.__indices.get(ids)
+        if index is None:
+            index = self.__indices[ids] = {}
+            for n, i in enumerate(getattr(self, ids)):
+                index.setdefault(i, n)
+        return index[item_id]
+
+    @staticmethod
+    def __read_only(*arrays):
+        for array in arrays:
+            array.flags.writeable = False
+        return arrays
+
+    @staticmethod
+    def __array(values, dtype, count):
+        array = numpy.fromiter(values, dtype, count)
+        array.flags.writeable = False
+        return array
+
+    @property
+    def shape(self):
+        """Shape of coefficients matrix of joints equilibrium equations."""
+        return 2 * len(self.joint_ids), len(self.unknowns_names())
+
+    def unknowns_names(self):
+        """
+        Return names of unknowns: forces in beams, roller supports
+        reactions, pinned supports x reactions and pinned supports y
+        reactions in that order.
+        """
+        rollers = numpy.flatnonzero(self.kind == ROLLER)
+        pinned = numpy.flatnonzero(self.kind == PINNED)
+        return [*self.beam_ids,
+                *(self.joint_ids[i] for i in rollers),
+                *(self.joint_ids[i] + "x" for i in pinned),
+                *(self.joint_ids[i] + "y" for i in pinned)]
+
+    def geometry(self):
+        """
+        Return hashable fingerprint of everything coefficients matrix
+        depends on (i.e. everything but forces).
+        """
+        return (self.joint_ids, self.beam_ids, self.kind.tobytes(),
+                self.xy.tobytes(), self.angle.tobytes(),
+                self.beam_ends.tobytes())
+
+
+KINDS = dict(PinJoint=PIN, PinnedSupport=PINNED, RollerSupport=ROLLER)
+DTYPES = dict(kind=numpy.int8, xy=float, angle=float, beam_ends=numpy.intp,
+              force_joint=numpy.intp, force_angle=float, force_value=float)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calculate truss files without GUI.
+
+Usage: batch.py [-h] [-f {jsonl,csv}] [-j JOBS] [-o OUTPUT] [-c CACHE]
+                PATH [PATH ...]
+
+Each PATH is truss file or directory searched recursively for truss files
+(*.json, *.jsonl and *.npy).
+Files are calculated in parallel, results and errors are streamed as soon as
+they are ready, summary with throughput is printed to stderr.
+With CACHE file outcomes are remembered by content of truss, so files which
+content was calculated by previous runs are only loaded.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+import csv
+import json
+import os
+import sys
+from cache import ResultCache
+from domain import Truss
+from journal import Journal
+from storage import EXTENSIONS
+
+CSV_FIELDS = ("file", "seconds", "error", "unknown", "value")
+cache = None  # results of previous runs, loaded in each worker process
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = find_files(args.paths, exclude=(args.output, args.cache))
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = JsonLinesWriter(out) if args.format == "jsonl" else CsvWriter(out)
+    failed = 0
+    start = perf_counter()
+    results_cache = ResultCache(None, args.cache) if args.cache else None
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=open_cache,
+                                 initargs=(args.cache,)) as executor:
+            futures = [executor.submit(calculate_file, f) for f in files]
+            for future in as_completed(futures):
+                result = future.result()
+                key = result.pop("hash", None)
+                if results_cache is not None and key is not None:
+                    results_cache.put(key, {k: result[k] for k in result
+                                            if k in ("results", "error")})
+                failed += "error" in result
+                writer.write(result)
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if results_cache is not None:
+            results_cache.save()
+    elapsed = perf_counter() - start
+    print(f"{len(files)} files ({failed} failed) in {elapsed:.3f} s, "
+          f"{len(files) / elapsed if elapsed else 0:.1f} files/s",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def parse_args(argv):
+    parser = ArgumentParser(description="Calculate truss files without GUI.")
+    parser.add_argument("paths", metavar="PATH", nargs="+",
+                        help="truss file or directory with truss files")
+    parser.add_argument("-f", "--format", choices=("jsonl", "csv"),
+                        default="jsonl", help="output format")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("-o", "--output", help="output file (stdout if none)")
+    parser.add_argument("-c", "--cache",
+                        help="file with results of previous runs (created "
+                             "if missing), unchanged trusses are not "
+                             "calculated again")
+    return parser.parse_args(argv)
+
+
+def open_cache(filename):
+    """Load results of previous runs in worker process."""
+    global cache  # pylint: disable=global-statement
+    cache = ResultCache(None, filename) if filename else None
+
+
+def find_files(paths, exclude=()):
+    """Find truss files, files in exclude are skipped in directories."""
+    excluded = {os.path.abspath(f) for f in exclude if f}
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                files += [os.path.join(directory, n) for n in sorted(names)
+                          if n.endswith(tuple(EXTENSIONS.values())) and
+                          os.path.abspath(os.path.join(directory, n))
+                          not in excluded]
+        else:
+            files.append(path)
+    return files
+
+
+def calculate_file(filename):
+    """
+    Return dict with file name, its "results" or "error" and "seconds"
+    spent. If results were taken from cache, "cached" is True. If truss was
+    loaded, its content "hash" is returned too.
+    """
+    start = perf_counter()
+    result = dict(file=filename)
+    try:
+        truss = Truss()
+        Journal(truss, filename).load(unsaved=False)
+        if cache is not None:
+            result["hash"] = truss.content_hash()
+            if result["hash"] in cache:
+                result.update(cache.get(result["hash"]), cached=True)
+                result["seconds"] = perf_counter() - start
+                return result
+        results = truss.calculate()
+        result["results"] = {n: float(v) for n, v in results.items()}
+    except Exception as error:  # pylint: disable=broad-except
+        result["error"] = f"{type(error).__name__}: {error}"
+    result["seconds"] = perf_counter() - start
+    return result
+
+
+class JsonLinesWriter:
+    def __init__(self, out):
+        self.__out = out
+
+    def write(self, result):
+        self.__out.write(json.dumps(result) + "\n")
+
+
+class CsvWriter:
+    """Write one row per unknown, files that failed get single row."""
+    def __init__(self, out):
+        self.__writer = csv.DictWriter(out, CSV_FIELDS)
+        self.__writer.writeheader()
+
+    def write(self, result):
+        row = dict(file=result["file"], seconds=f"{result['seconds']:.6f}",
+                   error=result.get("error", ""))
+        if "results" not in result:
+            self.__writer.writerow(row)
+        for name, value in result.get("results", {}).items():
+            self.__writer.writerow({**row, "unknown": name, "value": value})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure time and memory of truss operations on generated trusses.
+
+Usage: benchmark.py [-h] [-s {small,large}] [-k PATTERN] [-o OUTPUT]
+                    [-b BASELINE] [-t THRESHOLD] [-m MEMORY_THRESHOLD] [-u]
+
+Each operation is run on each truss of chosen size several times (the best
+time counts, fast operations are run more) and once more under tracemalloc
+to find peak of memory it allocates (memory allocated by C libraries
+bypassing Python allocator, e.g. by SuperLU, is not seen). Results are
+written as JSON to OUTPUT (stdout if none), table of them is printed to
+stderr.
+If BASELINE is given, results are compared with it: operations that take
+more than THRESHOLD times baseline time or MEMORY_THRESHOLD times baseline
+memory are reported as regressions and exit status is 1 (slower operations
+are measured again first, as time is noisy). Operations skipped on either
+side (e.g. redrawing by Python without Tk) are listed as not compared.
+With -u results are recorded in BASELINE instead, replacing ones of the
+same operations only. Baselines depend on machine, so they are recorded
+on the machine that runs benchmarks rather than shared. Redrawing needs
+no display: view is drawn on headless root which Tcl commands do nothing.
+"""
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from itertools import count
+from time import perf_counter
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from domain import History, Truss
+import generators
+
+# name: (generator, arguments), from tens to hundreds of thousands of beams
+SIZES = dict(
+    small={
+        "warren-10": (generators.warren, (10,)),
+        "warren-500": (generators.warren, (500,)),
+        "pratt-500": (generators.pratt, (500,)),
+        "howe-500": (generators.howe, (500,)),
+        "k_truss-500": (generators.k_truss, (500,)),
+        "grid-30x30": (generators.grid, (30, 30)),
+    },
+    large={
+        "warren-1000x50": (generators.warren, (1000, 50)),
+        "pratt-1000x50": (generators.pratt, (1000, 50)),
+        "howe-1000x50": (generators.howe, (1000, 50)),
+        "k_truss-1000x35": (generators.k_truss, (1000, 35)),
+        "grid-300x300": (generators.grid, (300, 300)),
+    },
+)
+REPEAT = dict(small=5, large=1)  # the least number of runs
+MIN_DURATION = 0.5  # seconds, fast operations are run more
+MAX_REPEAT = 100
+# times baseline, time is much noisier than memory
+THRESHOLDS = dict(seconds=2.0, peak_bytes=1.25)
+# smaller differences are noise even if they exceed threshold
+NOISE = dict(seconds=0.01, peak_bytes=256 * 1024)
+RETRIES = 2  # times slower operations are measured again before failing
+HISTORY_EDITS = 100  # joints moved by history benchmark
+VIEW_SIZE = 800, 600
+
+
+class Skipped(Exception):
+    """Operation can't be measured in this environment."""
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    keys = [f"{name}/{operation}" for name in SIZES[args.size]
+            for operation in OPERATIONS
+            if fnmatch(f"{name}/{operation}", args.pattern)]
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            if not args.update:
+                print(f"no baseline {args.baseline}, record it with -u "
+                      "(make benchmark_baselines)", file=sys.stderr)
+                return 2
+    thresholds = dict(seconds=args.threshold,
+                      peak_bytes=args.memory_threshold)
+    results = dict(size=args.size, python=platform.python_version(),
+                   machine=platform.platform(), results={})
+    regressions = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for attempt in range(RETRIES + 1):
+            run(args.size, keys, results["results"], directory)
+            if baseline is None or args.update:
+                break
+            regressions = compare(results, baseline, thresholds)
+            keys = [key for key, metric in regressions if metric == "seconds"]
+            if not keys or attempt == RETRIES:
+                break
+            print(f"measuring {len(keys)} slower operations again",
+                  file=sys.stderr)
+    write(results, args.output)
+    if args.update:
+        if args.baseline:
+            if baseline is not None:  # keep operations not run this time
+                results["results"] = {**baseline["results"],
+                                      **results["results"]}
+            write(results, args.baseline)
+        return 0
+    for regression in regressions.values():
+        print("REGRESSION", regression, file=sys.stderr)
+    if baseline is not None:
+        for key in not_compared(results, baseline):
+            print("NOT COMPARED", key, file=sys.stderr)
+        print(f"{len(regressions)} regressions against {args.baseline}",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def run(size, keys, results, directory):
+    """
+    Measure operations given by "truss/operation" keys and store results.
+    Time of operation measured before is replaced only with better one.
+    """
+    items = {}
+    for key in keys:
+        name, operation = key.split("/")
+        if name not in items:
+            generator, arguments = SIZES[size][name]
+            items = {name: generator(*arguments)}  # keep one truss only
+        result = dict(items=len(items[name]))
+        try:
+            result.update(measure(OPERATIONS[operation], items[name],
+                                  directory, REPEAT[size]))
+        except Skipped as reason:
+            result["skipped"] = str(reason)
+        old = results.get(key, {})
+        if "seconds" in old:
+            result["seconds"] = min(result["seconds"], old["seconds"])
+        results[key] = result
+        print(format_result(key, result), file=sys.stderr)
+
+
+def parse_args(argv):
+    parser = ArgumentParser(description="Measure time and memory of truss "
+                                        "operations on generated trusses.")
+    parser.add_argument("-s", "--size", choices=tuple(SIZES),
+                        default="small", help="set of trusses")
+    parser.add_argument("-k", "--pattern", default="*",
+                        help="run only benchmarks which truss/operation "
+                             "name matches this shell-style pattern")
+    parser.add_argument("-o", "--output", help="output file (stdout if none)")
+    parser.add_argument("-b", "--baseline",
+                        help="results of previous run to compare with")
+    parser.add_argument("-t", "--threshold", type=float,
+                        default=THRESHOLDS["seconds"],
+                        help="allowed ratio of time to baseline one")
+    parser.add_argument("-m", "--memory-threshold", type=float,
+                        default=THRESHOLDS["peak_bytes"],
+                        help="allowed ratio of memory to baseline one")
+    parser.add_argument("-u", "--update", action="store_true",
+                        help="replace baseline with results")
+    return parser.parse_args(argv)
+
+
+def measure(operation, items, directory, repeat):
+    """
+    Return best time of runs of operation (at least repeat ones lasting
+    MIN_DURATION in total) and peak memory it allocates. Operation is
+    context manager that prepares what is measured and gives function
+    running it.
+    """
+    times = []
+    while len(times) < repeat or \
+            sum(times) < MIN_DURATION and len(times) < MAX_REPEAT:
+        with operation(items, directory) as run:
+            gc.collect()
+            start = perf_counter()
+            run()
+            times.append(perf_counter() - start)
+    with operation(items, directory) as run:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return dict(seconds=min(times), peak_bytes=peak)
+
+
+def compare(results, baseline, thresholds=None):
+    """
+    Return {(key, metric): description} of results worse than baseline ones
+    more than thresholds ({metric: allowed ratio}, THRESHOLDS by default)
+    allow.
+    """
+    thresholds = thresholds or THRESHOLDS
+    regressions = {}
+    for key, old in baseline["results"].items():
+        new = results["results"].get(key)
+        if new is None or "skipped" in new or "skipped" in old:
+            continue
+        for metric, noise in NOISE.items():
+            if new[metric] > old[metric] * thresholds[metric] and \
+                    new[metric] - old[metric] > noise:
+                regressions[key, metric] = (
+                    f"{key} {metric}: {new[metric]:.6g} is "
+                    f"{new[metric] / old[metric]:.2f} times baseline "
+                    f"{old[metric]:.6g}")
+    return regressions
+
+
+def not_compared(results, baseline):
+    """Return keys of results skipped on either side or missing in baseline."""
+    return [key for key, new in results["results"].items()
+            if "skipped" in new or
+            "skipped" in baseline["results"].get(key, dict(skipped=True))]
+
+
+def format_result(key, result):
+    if "skipped" in result:
+        return f"{key:<32} skipped: {result['skipped']}"
+    return (f"{key:<32} {result['items']:>8} items "
+            f"{result['seconds'] * 1000:>10.2f} ms "
+            f"{result['peak_bytes'] / 2 ** 20:>9.2f} MiB")
+
+
+def write(results, filename):
+    if filename:
+        with open(filename, "w") as f:
+            json.dump(results, f, indent=1)
+            f.write("\n")
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+
+
+def truss_of(items):
+    truss = Truss()
+    truss.items = items
+    return truss
+
+
+@contextmanager
+def set_items(items, _):
+    truss = Truss()
+
+    def run():
+        truss.items = items
+    yield run
+
+
+@contextmanager
+def load_from(items, directory, extension):
+    filename = os.path.join(directory, "truss" + extension)
+    truss_of(items).save_as(filename)
+    yield lambda: Truss().load_from(filename)
+
+
+@contextmanager
+def save_as(items, directory, extension):
+    truss = truss_of(items)
+    filename = os.path.join(directory, "truss" + extension)
+    yield lambda: truss.save_as(filename)
+
+
+@contextmanager
+def calculate(items, _):
+    yield truss_of(items).calculate
+
+
+@contextmanager
+def history(items, _):
+    """Move joints one by one, then undo and redo all the moves."""
+    truss = truss_of(items)
+    undo_history = History(truss.apply_change)
+    truss.append_observer_callback(
+        lambda msg: msg["action"] == "truss modified" and
+        undo_history.append(msg))
+    joints = tuple(truss.joints)
+    joints = joints[::max(1, len(joints) // HISTORY_EDITS)][:HISTORY_EDITS]
+
+    def run():
+        for joint in joints:
+            truss.replace(joint, {**joint, "y": joint["y"] + 0.5})
+        while undo_history.can_undo():
+            undo_history.undo()
+        while undo_history.can_redo():
+            undo_history.redo()
+    yield run
+
+
+@contextmanager
+def refresh(items, _):
+    """Redraw truss in view of headless root (Tk itself draws nothing)."""
+    try:
+        from view import TrussView  # pylint: disable=import-outside-toplevel
+    except ImportError as error:  # Python without Tk
+        raise Skipped(str(error)) from None
+    view = TrussView(HeadlessRoot(), truss_of(items))
+    try:
+        yield view.refresh
+    finally:
+        view.destroy()
+
+
+class HeadlessRoot:
+    """
+    Stand-in for Tk root that needs no display: Tcl commands of its widgets
+    do nothing, canvas items get new ids and widgets are VIEW_SIZE big.
+    """
+    _w = "."
+    _last_child_ids = None
+
+    def __init__(self):
+        self.tk = HeadlessTcl()
+        self.children = {}
+
+
+class HeadlessTcl:
+    def __init__(self):
+        self.__ids = count(1)
+
+    def call(self, *args):
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        if args[1:2] == ("create",):
+            return next(self.__ids)
+        if args[:2] == ("winfo", "reqwidth"):
+            return VIEW_SIZE[0]
+        if args[:2] == ("winfo", "reqheight"):
+            return VIEW_SIZE[1]
+        return ""
+
+    @staticmethod
+    def getint(value):
+        return int(value or 0)
+
+    @staticmethod
+    def splitlist(value):
+        return value if isinstance(value, tuple) else ()
+
+    def createcommand(self, name, function):
+        pass
+
+    def deletecommand(self, name):
+        pass
+
+
+OPERATIONS = {
+    "items": set_items,
+    "load_json": lambda i, d: load_from(i, d, ".json"),
+    "load_binary": lambda i, d: load_from(i, d, ".npy"),
+    "save_json": lambda i, d: save_as(i, d, ".json"),
+    "save_binary": lambda i, d: save_as(i, d, ".npy"),
+    "calculate": calculate,
+    "history": history,
+    "refresh": refresh,
+}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache of calculation outcomes keyed by Truss.content_hash, so truss which
+content was calculated before (e.g. after undo or in next batch run) is not
+calculated again.
+"""
+from collections import OrderedDict
+import json
+import os
+
+
+class ResultCache:
+    """
+    Least recently used outcomes (dicts with "results" or "error"), at most
+    max_size of them (no limit if None). If filename is given, outcomes
+    stored there are loaded and save() writes them back.
+    """
+    def __init__(self, max_size=256, filename=None):
+        self.max_size = max_size
+        self.filename = filename
+        self.__outcomes = OrderedDict()
+        if filename and os.path.exists(filename):
+            with open(filename, "r") as f:
+                for key, outcome in json.load(f):  # the oldest first
+                    self.put(key, outcome)
+
+    def __len__(self):
+        return len(self.__outcomes)
+
+    def __contains__(self, key):
+        return key in self.__outcomes
+
+    def get(self, key):
+        """Return outcome stored for key (None if there is none)."""
+        outcome = self.__outcomes.get(key)
+        if outcome is not None:
+            self.__outcomes.move_to_end(key)
+        return outcome
+
+    def put(self, key, outcome):
+        self.__outcomes[key] = outcome
+        self.__outcomes.move_to_end(key)
+        while self.max_size is not None and \
+                len(self.__outcomes) > self.max_size:
+            self.__outcomes.popitem(last=False)
+
+    def save(self):
+        """Write outcomes to file (replaced only when written completely)."""
+        temporary = self.filename + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump([[key, self.__plain(outcome)]
+                       for key, outcome in self.__outcomes.items()], f)
+        os.replace(temporary, self.filename)
+
+    @staticmethod
+    def __plain(outcome):
+        """Return outcome with NumPy numbers converted for JSON."""
+        if "results" not in outcome:
+            return outcome
+        return {**outcome, "results": {name: float(value) for name, value
+                                       in outcome["results"].items()}}
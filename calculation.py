@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Truss calculation on background thread, so GUI stays responsive.
+
+Thread gets arrays.TrussArrays of truss, which are immutable, so truss can
+be edited while it is calculated. Thread only queues messages, observers
+are notified from poll() which is called on GUI thread. Factorization of
+the latest run is kept, so runs that differ in forces only (or in a few
+joints) don't factorize coefficients matrix from scratch.
+"""
+import queue
+import threading
+from domain import import_solver
+from misc import Observable
+
+
+class Cancelled(Exception):
+    """Calculation was cancelled."""
+
+
+class Calculation(Observable):
+    """
+    Background calculation. Observers get messages with action
+    "calculation progress" (with stage), "calculation finished" (with
+    results) and "calculation failed" (with error). Each start() supersedes
+    previous run: messages of superseded and cancelled runs are dropped.
+    """
+    def __init__(self, sparse=None):
+        super().__init__()
+        self.__sparse = sparse
+        self.__messages = queue.SimpleQueue()  # (run, message)
+        self.__run = 0  # number of the latest run
+        self.__cancelled = threading.Event()  # of the latest run
+        # solver.factorize_model() result, replaced as a whole by threads
+        self.__factorization = None
+        self.running = False
+
+    def start(self, model):
+        """Start calculation of model (arrays.TrussArrays)."""
+        self.cancel()
+        self.__run += 1
+        self.__cancelled = threading.Event()
+        self.running = True
+        threading.Thread(target=self.__calculate, daemon=True,
+                         args=(self.__run, model, self.__cancelled)).start()
+
+    def cancel(self):
+        """Stop the latest run as soon as it reports progress."""
+        self.__cancelled.set()
+        self.running = False
+
+    def poll(self):
+        """
+        Notify observers of messages queued by the latest run. Return True
+        if it is still running.
+        """
+        while True:
+            try:
+                run, message = self.__messages.get_nowait()
+            except queue.Empty:
+                return self.running
+            if run == self.__run and self.running:
+                if message["action"] != "calculation progress":
+                    self.running = False
+                self.notify(message)
+
+    def __calculate(self, run, model, cancelled):
+        def progress(stage):
+            if cancelled.is_set():
+                raise Cancelled()
+            self.__messages.put((run, dict(action="calculation progress",
+                                           stage=stage)))
+
+        try:
+            solver = import_solver()
+            factorization = solver.factorize_model(
+                model, self.__sparse, self.__factorization, progress)
+            if run == self.__run:  # superseded run would evict newer one
+                self.__factorization = factorization
+            _, x_names, _, factorization = factorization
+            progress("solving")
+            b = solver.constants(model.shape[0], model.force_joint,
+                                 model.force_angle, model.force_value)
+            results = dict(zip(x_names, factorization.solve(b)))
+            message = dict(action="calculation finished", results=results)
+        except Cancelled:
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            message = dict(action="calculation failed", error=error)
+        self.__messages.put((run, message))
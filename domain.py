@@ -1,41 +1,82 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from itertools import repeat
-from math import atan2, cos, sin, radians
+from bisect import insort
+from collections import Counter, deque
+from contextlib import contextmanager
+from hashlib import blake2b
 import json
+from math import inf
 import re
-import numpy  # type: ignore # pylint: disable=import-error
+import sys
+from time import monotonic
 from misc import Observable
+from spatial import Grid
+import storage
+
+
+def import_solver():
+    """
+    Import solver on first calculation: it loads NumPy (and SciPy) which is
+    slow, while many users of this module only edit, load or save trusses.
+    """
+    import solver  # pylint: disable=import-outside-toplevel
+    return solver
 
 
 class History(Observable):
-    def __init__(self, state):
+    """
+    Undo/redo history of changes. Change is dict with "added" and "removed"
+    items and "modified" (old, new) pairs, as in "truss modified" message.
+    apply is called with change to redo it or with inverse one to undo it.
+    Changes appended within interval seconds of previous one are undone
+    together. Only max_depth last steps referencing at most max_items items
+    are kept (no limit if None).
+    """
+    def __init__(self, apply, max_depth=None, max_items=None, interval=0):
         super().__init__()
-        self.__state = state
-        self.__undo_history = []
+        self.__apply = apply
+        self.__max_depth = max_depth
+        self.__max_items = max_items
+        self.__interval = interval
+        self.__undo_history = deque()  # steps, i.e. lists of changes
         self.__redo_history = []
-        self.reset(state)
-
-    def append(self, state):
-        if state != self.__state:
-            self.__undo_history.append(self.__state)
-            self.__state = state
-            self.__redo_history.clear()
-            self.notify(dict(action="history changed"))
+        self.__undo_items = 0  # number of items undo history references
+        self.__applying = False
+        self.__last_append = None
+        self.reset()
+
+    def append(self, change):
+        if self.__applying or not self.size(change):
+            return
+        change = {k: tuple(change.get(k, ())) for k in CHANGE_FIELDS}
+        now = monotonic()
+        if self.__last_append is not None and self.__undo_history and \
+                not self.__redo_history and \
+                now - self.__last_append < self.__interval:
+            self.__undo_history[-1].append(change)
+        else:
+            self.__undo_history.append([change])
+        self.__undo_items += self.size(change)
+        self.__last_append = now
+        self.__redo_history.clear()
+        self.__forget_oldest()
+        self.notify(dict(action="history changed"))
 
     def undo(self):
         if self.can_undo():
-            self.__redo_history.append(self.__state)
-            self.__state = self.__undo_history.pop()
+            step = self.__undo_history.pop()
+            self.__undo_items -= self.size(*step)
+            self.__apply_all(self.inverse(c) for c in reversed(step))
+            self.__redo_history.append(step)
             self.notify(dict(action="history changed"))
-        return self.__state
 
     def redo(self):
         if self.can_redo():
-            self.__undo_history.append(self.__state)
-            self.__state = self.__redo_history.pop()
+            step = self.__redo_history.pop()
+            self.__apply_all(step)
+            self.__undo_history.append(step)
+            self.__undo_items += self.size(*step)
             self.notify(dict(action="history changed"))
-        return self.__state
 
     def can_undo(self):
         return bool(self.__undo_history)
@@ -43,12 +84,56 @@ class History(Observable):
     def can_redo(self):
         return bool(self.__redo_history)
 
-    def reset(self, state):
-        self.__state = state
+    def reset(self):
         self.__undo_history.clear()
         self.__redo_history.clear()
+        self.__undo_items = 0
+        self.__last_append = None
         self.notify(dict(action="history changed"))
 
+    @staticmethod
+    def inverse(change):
+        return dict(added=change["removed"], removed=change["added"],
+                    modified=tuple((new, old)
+                                   for old, new in change["modified"]))
+
+    @staticmethod
+    def size(*changes):
+        """Return number of items changes reference."""
+        return sum(len(c.get("added", ())) + len(c.get("removed", ())) +
+                   2 * len(c.get("modified", ())) for c in changes)
+
+    def __apply_all(self, changes):
+        self.__applying = True  # changes we apply are already recorded
+        try:
+            for change in changes:
+                self.__apply(change)
+        finally:
+            self.__applying = False
+            self.__last_append = None  # don't coalesce with undone step
+
+    def __forget_oldest(self):
+        def too_deep():
+            return self.__max_depth is not None and \
+                len(self.__undo_history) > self.__max_depth
+
+        def too_big():
+            return self.__max_items is not None and \
+                self.__undo_items > self.__max_items
+
+        while len(self.__undo_history) > 1 and (too_deep() or too_big()):
+            self.__undo_items -= self.size(*self.__undo_history.popleft())
+
+
+CHANGE_FIELDS = ("added", "removed", "modified")
+
+
+DIGITS = re.compile(r"\d+")
+REFERENCES = dict(Beam=("id", "end1", "end2"), Force=("id", "applied_to"))
+# coordinates of joints item references, given by items being edited only
+COORDINATES = dict(Beam=(("x1", "y1", "end1"), ("x2", "y2", "end2")),
+                   Force=(("x", "y", "applied_to"),))
+
 
 class Truss(Observable):
     JOINTS = ("PinJoint", "PinnedSupport", "RollerSupport")
@@ -61,95 +146,457 @@ class Truss(Observable):
 
     def __init__(self):
         super().__init__()
-        self.__items = ()
-        self.__left = 0
-        self.__right = 0
-        self.__bottom = 0
-        self.__top = 0
+        self.__items = {}  # key -> item, in items order
+        self.__items_tuple = ()
+        self.__records = None  # loaded binary records not made items yet
+        self.__next_key = 0
+        self.__by_id = {}  # item id -> sorted keys of items with this id
+        self.__indices = {}  # item type -> Counter of indices in ids
+        self.__max_index = {}  # item type -> max index or None if unknown
+        self.__linked = {}  # joint id -> (linked beams, linked forces)
+        self.__joints_count = 0
+        self.__dimensions = (0, 0, 0, 0)  # or None if unknown
+        self.__batch_depth = 0
+        self.__changes = {}  # id of item -> [item, present before, now]
+        self.__replaced = []  # (old, new) pairs
+        self.__modified = False
+        self.__arrays = None
+        self.__grids = None  # spatial indices of joints and beams
+        self.__grids_built_for = 0  # number of joints
+        self.__content_hash = None  # sum of items hashes or None if unknown
+        self.__factorization = None
 
     @property
     def items(self):
-        return self.__items
+        self.__materialize()
+        if self.__items_tuple is None:
+            self.__items_tuple = tuple(self.__items.values())
+        return self.__items_tuple
 
     @items.setter
     def items(self, t):
-        self.__items = tuple(t)
-        self.__remove_invalid()
-        self.__update_cache()
-        self.__update_dimensions()
-        self.notify(dict(action="truss modified"))
+        with self.batch():
+            self.__modified = True  # even if truss stays empty
+            self.__records = None
+            for item in self.items:
+                self.__record(item, present=False)
+            self.__clear()
+            for item in t:
+                self.__record(self.__insert(self.__new_key(), item))
 
     def __iter__(self):
         return iter(self.items)
 
-    def __remove_invalid(self):
-        invalid_beams = tuple(b for b in self.find_by_type("Beam")
-                              if None in (self.find_by_id(b["end1"]),
-                                          self.find_by_id(b["end2"])))
-        invalid_forces = tuple(f for f in self.find_by_type("Force")
-                               if self.find_by_id(f["applied_to"]) is None)
-        invalid = invalid_beams + invalid_forces
+    @property
+    def arrays(self):
+        """
+        Return arrays.TrussArrays of current items. It is built on first
+        access after modification and shared until the next one.
+        """
+        if self.__arrays is None:
+            from arrays import TrussArrays  # pylint: disable=C0415
+            self.__arrays = TrussArrays(tuple(self.joints),
+                                        tuple(self.find_by_type("Beam")),
+                                        tuple(self.find_by_type("Force")))
+        return self.__arrays
+
+    @contextmanager
+    def batch(self):
+        """
+        Group modifications made in with block, observers are notified once
+        at the end of the outermost block.
+        """
+        with self.hold_notifications():
+            self.__batch_depth += 1
+            try:
+                yield self
+            finally:
+                self.__batch_depth -= 1
+                if not self.__batch_depth:
+                    self.__commit()
+
+    def new(self):
+        self.items = ()
+
+    def apply_change(self, change):
+        """
+        Apply change (as listed in "truss modified" message) in one batch:
+        remove "removed" items, replace old items of "modified" (old, new)
+        pairs with new ones and append "added" items.
+        """
+        with self.batch():
+            for item in change["removed"]:
+                self.remove(item)
+            for old, new in change["modified"]:
+                self.replace(old, new)
+            for item in change["added"]:
+                self.append(item)
+
+    def append(self, item):
+        self.__materialize()
+        with self.batch():
+            self.__record(self.__insert(self.__new_key(), item))
+
+    def remove(self, item):
+        self.__materialize()
+        with self.batch():
+            self.__modified = True  # even if there is no such item
+            for key in self.__keys_of(item):
+                self.__record(self.__delete(key), present=False)
+
+    def replace(self, old, new):
+        self.__materialize()
+        keys = self.__keys_of(old) if old is not None else []
+        if not keys:
+            self.append(new)
+            return
+        with self.batch():
+            for key in keys[1:]:
+                self.__record(self.__delete(key), present=False)
+            # keep position, so equations order is kept
+            old = self.__delete(keys[0], keep_position=True)
+            self.__record(old, present=False)
+            self.__record(self.__insert(keys[0], new))
+            self.__replaced.append((old, new))
+
+    def __record(self, item, present=True):
+        """Remember that item was added (or removed if not present)."""
+        change = self.__changes.setdefault(id(item), [item, not present, 0])
+        change[2] = present
+        self.__modified = True
+
+    def __commit(self):
+        loaded = self.__records is not None  # and arrays were built of them
+        if loaded and self.observer_callbacks:
+            self.__materialize(record=True)  # observers need loaded items
+        changes, replaced = self.__changes.values(), self.__replaced
+        modified = self.__modified
+        self.__changes, self.__replaced, self.__modified = {}, [], False
+        if not modified:
+            return
+        added = [i for i, before, now in changes if now and not before]
+        removed = [i for i, before, now in changes if before and not now]
+        invalid = self.__validate(added, removed)
+        added_ids = {id(i) for i in added}
+        removed += [i for i in invalid if id(i) not in added_ids]
+        added_ids -= {id(i) for i in invalid}
+        removed_ids = {id(i) for i in removed}
+        pairs = tuple((old, new) for old, new in replaced
+                      if id(old) in removed_ids and id(new) in added_ids)
+        paired = {id(i) for pair in pairs for i in pair}
+        added = tuple(i for i in added
+                      if id(i) in added_ids and id(i) not in paired)
+        removed = tuple(i for i in removed if id(i) not in paired)
+        if not loaded:
+            if added or removed:
+                self.__arrays = None
+            elif self.__arrays is not None:
+                self.__arrays = self.__patched_arrays(pairs)
         if invalid:
-            self.__items = tuple(i for i in self.items if i not in invalid)
-            self.notify(dict(action="invalid items removed", items=invalid))
-
-    def __update_cache(self):
-        for beam in self.find_by_type("Beam"):
-            end1 = self.find_by_id(beam["end1"])
-            end2 = self.find_by_id(beam["end2"])
-            beam.update(dict(x1=end1["x"], y1=end1["y"],
-                             x2=end2["x"], y2=end2["y"]))
-        for force in self.find_by_type("Force"):
-            joint = self.find_by_id(force["applied_to"])
-            force.update(dict(x=joint["x"], y=joint["y"]))
-
-    def __update_dimensions(self):
-        xs = tuple(j["x"] for j in self.joints)
-        ys = tuple(j["y"] for j in self.joints)
-        self.__left = min(xs, default=0)
-        self.__right = max(xs, default=0)
-        self.__bottom = min(ys, default=0)
-        self.__top = max(ys, default=0)
+            self.notify(dict(action="invalid items removed",
+                             items=tuple(invalid)))
+        self.notify(dict(action="truss modified", added=added,
+                         removed=removed, modified=pairs))
+
+    def __patched_arrays(self, pairs):
+        """Return arrays with pairs patched in, None if they can't be."""
+        groups = dict(joints=[], beams=[], forces=[])
+        for old, new in pairs:
+            group = self.__group_of(new)
+            if old["id"] != new["id"] or self.__group_of(old) != group or \
+                    len(self.__by_id[new["id"]]) > 1:
+                return None
+            groups[group].append(new)
+        return self.__arrays.patched(**groups)
+
+    @classmethod
+    def __group_of(cls, item):
+        if cls.is_joint(item):
+            return "joints"
+        return "beams" if item["type"] == "Beam" else "forces"
+
+    def __validate(self, added, removed):
+        """Remove and return beams and forces of inexistent joints."""
+        changed = {i["id"] for i in (*added, *removed) if self.is_joint(i)}
+        suspects = {}  # key -> beam or force that may be invalid
+        for item in added:
+            if item["type"] in ("Beam", "Force"):
+                suspects[self.__key_of(item)] = item
+        for joint_id in changed:
+            if joint_id not in self.__by_id:
+                for linked in self.__linked.get(joint_id, ({}, {})):
+                    suspects.update(linked)
+        invalid = [(k, i) for k, i in sorted(suspects.items())
+                   if not self.__is_valid(i)]
+        invalid.sort(key=lambda ki: ki[1]["type"] == "Force")
+        for key, _ in invalid:
+            self.__delete(key)
+            del suspects[key]
+        if self.__grids:
+            for joint_id in changed:  # suspects left are valid
+                suspects.update(self.__linked.get(joint_id, ({}, {}))[0])
+            for key, item in suspects.items():
+                if item["type"] == "Beam":
+                    self.__grids[1].add(key, item, self.coordinates(item))
+        return [i for _, i in invalid]
+
+    def __is_valid(self, item):
+        if item["type"] == "Beam":
+            return item["end1"] in self.__by_id and \
+                item["end2"] in self.__by_id
+        return item["applied_to"] in self.__by_id
+
+    def __clear(self):
+        self.__items = {}
+        self.__items_tuple = ()
+        self.__by_id = {}
+        self.__indices = {}
+        self.__max_index = {}
+        self.__linked = {}
+        self.__joints_count = 0
+        self.__dimensions = None
+        self.__grids = None
+        self.__content_hash = None
+
+    def __materialize(self, record=None):
+        """Create items of records loaded from binary file, if any."""
+        records, self.__records = self.__records, None
+        if records is None:
+            return
+        if record is None:
+            record = self.__batch_depth > 0
+        for item in storage.items_of(records):
+            self.__insert(self.__new_key(), item)
+            if record:
+                self.__record(item)
+
+    def __new_key(self):
+        self.__next_key += 1
+        return self.__next_key
+
+    def __keys_of(self, item):
+        """Return keys of items equal to item (in mandatory fields)."""
+        fields = self.MANDATORY_FIELDS.get(item.get("type"))
+        if fields is None:
+            return [k for k in self.__by_id.get(item.get("id"), ())
+                    if self.__items[k] == item]
+        return [k for k in self.__by_id.get(item.get("id"), ())
+                if all(self.__items[k].get(f) == item.get(f) for f in fields)]
+
+    def __key_of(self, item):
+        """Return key of item (this very object) or None if it is absent."""
+        for key in self.__by_id.get(item["id"], ()):
+            if self.__items[key] is item:
+                return key
+        return None
+
+    def __insert(self, key, item):
+        self.__intern_ids(item)
+        for x, y, _ in COORDINATES.get(item["type"], ()):
+            item.pop(x, None)  # they would get stale, joints are the source
+            item.pop(y, None)
+        self.__items[key] = item
+        self.__items_tuple = None
+        item_type = item["type"]
+        keys = self.__by_id.get(item["id"])
+        if keys is None:
+            self.__by_id[item["id"]] = [key]
+        else:
+            insort(keys, key)
+        index = self.id_index(item["id"])
+        indices = self.__indices.get(item_type)
+        if indices is None:
+            indices = self.__indices[item_type] = Counter()
+        indices[index] += 1
+        max_index = self.__max_index.get(item_type, 0)
+        if max_index is not None and index > max_index:
+            self.__max_index[item_type] = index
+        if item_type == "Beam":
+            for end in {item["end1"], item["end2"]}:
+                self.__linked_to(end)[0][key] = item
+        elif item["type"] == "Force":
+            self.__linked_to(item["applied_to"])[1][key] = item
+        elif self.is_joint(item):
+            self.__extend_dimensions(item)
+            if self.__grids:
+                self.__grids[0].add(key, item, (item["x"], item["y"]))
+        if self.__content_hash is not None:
+            self.__content_hash += self.__item_hash(item)
+        return item
+
+    def __delete(self, key, keep_position=False):
+        """Remove item with key from items and all indices, return it."""
+        item = self.__items[key]
+        if not keep_position:
+            del self.__items[key]
+        self.__items_tuple = None
+        keys = self.__by_id[item["id"]]
+        keys.remove(key)
+        if not keys:
+            del self.__by_id[item["id"]]
+        index = self.id_index(item["id"])
+        indices = self.__indices[item["type"]]
+        indices[index] -= 1
+        if not indices[index]:
+            del indices[index]
+            if index == self.__max_index.get(item["type"]):
+                self.__max_index[item["type"]] = None
+        if item["type"] == "Beam":
+            for end in {item["end1"], item["end2"]}:
+                self.__unlink(end, 0, key)
+        elif item["type"] == "Force":
+            self.__unlink(item["applied_to"], 1, key)
+        elif self.is_joint(item):
+            self.__shrink_dimensions(item)
+        if self.__grids:
+            self.__grids[item["type"] == "Beam"].discard(key)
+        if self.__content_hash is not None:
+            self.__content_hash -= self.__item_hash(item)
+        return item
+
+    @staticmethod
+    def __intern_ids(item):
+        """Share one string object between id and all references to it."""
+        for field in REFERENCES.get(item.get("type"), ("id",)):
+            if isinstance(item.get(field), str):
+                item[field] = sys.intern(item[field])
+
+    def __linked_to(self, joint_id):
+        linked = self.__linked.get(joint_id)
+        if linked is None:
+            linked = self.__linked[joint_id] = ({}, {})
+        return linked
+
+    def __unlink(self, joint_id, kind, key):
+        linked = self.__linked[joint_id]
+        del linked[kind][key]
+        if not any(linked):
+            del self.__linked[joint_id]
+
+    def coordinates(self, item):
+        """
+        Return x, y of joint or of joint force is applied to, x1, y1, x2, y2
+        of beam ends. Coordinates item has itself (as item being edited
+        may have) are preferred to ones of joints it references.
+        """
+        if item["type"] not in COORDINATES:
+            return item["x"], item["y"]
+        coordinates = ()
+        for x, y, reference in COORDINATES[item["type"]]:
+            if x in item:
+                coordinates += item[x], item[y]
+            else:
+                joint = self.find_by_id(item[reference])
+                coordinates += joint["x"], joint["y"]
+        return coordinates
+
+    def __extend_dimensions(self, joint):
+        self.__joints_count += 1
+        if self.__dimensions is None:
+            return
+        if self.__joints_count == 1:
+            self.__dimensions = joint["x"], joint["x"], joint["y"], joint["y"]
+        else:
+            left, right, bottom, top = self.__dimensions
+            self.__dimensions = (min(left, joint["x"]), max(right, joint["x"]),
+                                 min(bottom, joint["y"]), max(top, joint["y"]))
+
+    def __shrink_dimensions(self, joint):
+        self.__joints_count -= 1
+        if self.__dimensions is not None and \
+                (joint["x"] in self.__dimensions[:2] or
+                 joint["y"] in self.__dimensions[2:]):
+            self.__dimensions = None  # joint was on the boundary
+
+    def __get_dimensions(self):
+        if self.__dimensions is None:
+            xs = tuple(j["x"] for j in self.joints)
+            ys = tuple(j["y"] for j in self.joints)
+            self.__dimensions = (min(xs, default=0), max(xs, default=0),
+                                 min(ys, default=0), max(ys, default=0))
+        return self.__dimensions
 
     @property
     def left(self):
-        return self.__left
+        return self.__get_dimensions()[0]
 
     @property
     def right(self):
-        return self.__right
+        return self.__get_dimensions()[1]
 
     @property
     def bottom(self):
-        return self.__bottom
+        return self.__get_dimensions()[2]
 
     @property
     def top(self):
-        return self.__top
+        return self.__get_dimensions()[3]
 
-    def new(self):
-        self.items = ()
+    def save_as(self, filename):
+        """
+        Save mandatory fields of items. Format is chosen by filename
+        extension: .jsonl for JSON Lines, .npy for binary, JSON otherwise.
+        """
+        items = self.items
+        if storage.format_for(filename) != "binary":  # it stores them only
+            items = map(self.strip, items)
+        storage.save(items, filename)
 
-    def append(self, item):
-        self.items = self.items + (item,)
+    @classmethod
+    def strip(cls, item):
+        """Return copy of item with mandatory fields only."""
+        return {f: item[f] for f in cls.MANDATORY_FIELDS[item["type"]]}
 
-    def remove(self, item):
-        self.items = tuple(x for x in self.items if item != x)
+    def content_hash(self):
+        """
+        Return hex digest of fields save_as keeps, items order is ignored.
+        """
+        if self.__content_hash is None:
+            self.__content_hash = sum(map(self.__item_hash, self.items))
+        return f"{self.__content_hash % 2 ** 128:032x}"
 
-    def replace(self, old, new):
-        self.items = tuple(x for x in self.items if old != x) + (new,)
+    @classmethod
+    def __item_hash(cls, item):
+        fields = {f: float(v) if isinstance(v, int) else v
+                  for f, v in cls.strip(item).items()}
+        digest = blake2b(json.dumps(fields, sort_keys=True).encode(),
+                         digest_size=16).digest()
+        return int.from_bytes(digest, "big")
 
-    def save_as(self, filename):
-        def drop_cache(items):
-            return tuple({f: i[f] for f in self.MANDATORY_FIELDS[i["type"]]}
-                         for i in items)
+    def load_from(self, filename):
+        """
+        Load items from file in any format save_as supports. Items of binary
+        file are created on first access only.
+        """
+        if storage.format_of(filename) == "binary":
+            records = storage.open_binary(filename)
+            arrays = storage.arrays_of(records)
+            if arrays is not None:
+                with self.batch():
+                    self.items = ()
+                    self.__records, self.__arrays = records, arrays
+                return
+        self.items = tuple(storage.load(filename))  # fail before clearing
 
-        with open(filename, "w") as f:
-            f.write(json.dumps(drop_cache(self.items)))
+    @property
+    def items_count(self):
+        self.__materialize()
+        return len(self.__items)
 
-    def load_from(self, filename):
-        with open(filename, "r") as f:
-            self.items = json.load(f)
+    @property
+    def joints_count(self):
+        self.__materialize()
+        return self.__joints_count
+
+    @property
+    def spacing(self):
+        """Return typical distance between joints spread over truss."""
+        count, width, height = self.joints_count, self.width, self.height
+        if count < 2:
+            return 0
+        if width and height:
+            return (width * height / count) ** 0.5
+        return (width + height) / (count - 1)
 
     @property
     def width(self):
@@ -160,20 +607,30 @@ class Truss(Observable):
         return self.top - self.bottom
 
     def find_by_id(self, item_id):
-        items = tuple(filter(lambda x: item_id == x["id"], self.items))
-        return items[0] if items else None
+        self.__materialize()
+        keys = self.__by_id.get(item_id)
+        return self.__items[keys[0]] if keys else None
+
+    def find_all_by_id(self, item_id):
+        """Return all items with given id (there may be duplicates)."""
+        self.__materialize()
+        return tuple(self.__items[k] for k in self.__by_id.get(item_id, ()))
 
     def find_by_type(self, item_type):
         return (i for i in self.items if i["type"] == item_type)
 
     def get_new_id_for(self, item_type):
-        def extract_index(item_id):
-            return int(re.findall(r'\d+', item_id)[0])
-
+        self.__materialize()
         prefix = re.sub("[^A-Z]", "", item_type)
-        max_id = max([extract_index(i["id"])
-                      for i in self.find_by_type(item_type)], default=0)
-        return f"{prefix}{max_id + 1}"
+        if self.__max_index.get(item_type, 0) is None:
+            self.__max_index[item_type] = max(self.__indices[item_type],
+                                              default=0)
+        return f"{prefix}{self.__max_index.get(item_type, 0) + 1}"
+
+    @staticmethod
+    def id_index(item_id):
+        digits = DIGITS.search(item_id)
+        return int(digits.group()) if digits else 0
 
     @property
     def joints(self):
@@ -184,69 +641,145 @@ class Truss(Observable):
         return item.get("type") in cls.JOINTS
 
     def linked_beams(self, joint):
-        return tuple(beam for beam in self.find_by_type("Beam")
-                     if joint["id"] in (beam["end1"], beam["end2"]))
+        return self.__linked_items(joint, 0)
 
     def linked_forces(self, joint):
-        return tuple(force for force in self.find_by_type("Force")
-                     if joint["id"] == force["applied_to"])
+        return self.__linked_items(joint, 1)
+
+    def __linked_items(self, joint, kind):
+        self.__materialize()
+        linked = self.__linked.get(joint["id"], ({}, {}))[kind]
+        return tuple(linked[k] for k in sorted(linked))
 
-    def calculate(self):  # pylint: disable=too-many-locals
+    def nearest_joint(self, x, y, max_distance=inf):
+        """
+        Return joint nearest to point x, y not farther than max_distance
+        (None if there is no such joint).
+        """
+        found = self.__spatial_index()[0].nearest_point(x, y, max_distance)
+        return found[1] if found else None
+
+    def hit_beam(self, x, y, tolerance):
+        """Return beam nearest to point x, y not farther than tolerance."""
+        found = self.__spatial_index()[1].nearest_segment(x, y, tolerance)
+        return found[1] if found else None
+
+    def items_in_rect(self, left, bottom, right, top):
+        """
+        Return joints in rectangle, beams crossing it and forces applied to
+        joints in it, in items order.
+        """
+        joints, beams = self.__spatial_index()
+        found = joints.in_rect(left, bottom, right, top)
+        for joint in tuple(found.values()):
+            found.update(self.__linked.get(joint["id"], ({}, {}))[1])
+        found.update(beams.in_rect(left, bottom, right, top))
+        return tuple(found[k] for k in sorted(found))
+
+    def __spatial_index(self):
+        """Return grids of joints and beams, built on first query."""
+        self.__materialize()
+        if self.__grids is None or \
+                self.joints_count > 4 * self.__grids_built_for:
+            cell_size = self.spacing or max(self.width, self.height, 1)
+            self.__grids = Grid(cell_size), Grid(cell_size)
+            self.__grids_built_for = max(self.joints_count, 1)
+            for key, item in self.__items.items():
+                if self.is_joint(item):
+                    self.__grids[0].add(key, item, (item["x"], item["y"]))
+                elif item["type"] == "Beam" and self.__is_valid(item):
+                    self.__grids[1].add(key, item, self.coordinates(item))
+        return self.__grids
+
+    def calculate(self, sparse=None):
         """
         Calculate reactions using method of joints.
         https://en.wikipedia.org/wiki/Structural_analysis#Method_of_Joints
+        Equations are assembled in sparse (coordinate) format. Sparse solver
+        is used if sparse is True, dense one if False, or chosen depending
+        on truss size if None.
+        """
+        x_names, factorization = self.__factorize(sparse)
+        model = self.arrays
+        b = import_solver().constants_matrix(factorization.shape[0], [(
+            model.force_joint, model.force_angle, model.force_value)])
+        return dict(zip(x_names, factorization.solve(b)[:, 0]))
+
+    def calculate_load_cases(self, load_cases, sparse=None):
+        """
+        Calculate reactions for several load cases at once. load_cases maps
+        case name to collection of Force items applied to joints of this
+        truss. Return dict mapping case name to results of that case.
+        """
+        x_names, factorization = self.__factorize(sparse)
+        index = self.arrays.joint_index
+        solver = import_solver()
+        cases = []  # forces joints, angles and values of each load case
+        for forces in load_cases.values():
+            forces = tuple(forces)
+            for f in forces:
+                if f["applied_to"] not in index:
+                    raise ValueError(f"{f['id']} is applied to inexistent "
+                                     f"joint {f['applied_to']}")
+            cases.append(([index[f["applied_to"]] for f in forces],
+                          [f["angle"] for f in forces],
+                          [f["value"] for f in forces]))
+
+        b = solver.constants_matrix(factorization.shape[0], cases)
+        x_values = factorization.solve(b)
+        return {case: dict(zip(x_names, x_values[:, i]))
+                for i, case in enumerate(load_cases)}
+
+    def influence_lines(self, sparse=None):
+        """
+        Calculate forces in beams and reactions for unit load at every joint
+        in one pass against single factorization. Return
+        solver.InfluenceLines that can be queried for envelopes and critical
+        load positions.
+        """
+        x_names, factorization = self.__factorize(sparse)
+        solver = import_solver()
+        return solver.influence_lines(factorization, x_names,
+                                      list(self.arrays.joint_ids))
+
+    def sweep(self, parameters):
+        """
+        Calculate many variants of this truss at once. parameters maps item
+        id to dict mapping item field to sequence of its values, one per
+        variant. Joints "x" and "y", roller supports "angle", forces "angle"
+        and "value" can be varied. Return dict with unknowns "names", their
+        "values" (variants × unknowns array) and per variant "indeterminate"
+        and "unbalanced" flags (values of such variants are NaN).
         """
-        def beam_angle(b, origin):
-            end_id = b["end1"] if origin["id"] == b["end2"] else b["end2"]
-            end = self.find_by_id(end_id)
-            return atan2(origin["y"] - end["y"], origin["x"] - end["x"])
-
-        def force_x_value(force):
-            return force["value"] * cos(radians(force["angle"]))
-
-        def force_y_value(force):
-            return force["value"] * sin(radians(force["angle"]))
-
-        # a·x = b (https://en.wikipedia.org/wiki/System_of_linear_equations)
-        a = []  # coefficients matrix
-        x = []  # unknown reactions vector
-        b = []  # constants vector (known forces)
-
-        forces_in_beams = zip(self.find_by_type("Beam"), repeat(""))
-        rs_reactions = zip(self.find_by_type("RollerSupport"), repeat(""))
-        ps_x_reactions = zip(self.find_by_type("PinnedSupport"), repeat("x"))
-        ps_y_reactions = zip(self.find_by_type("PinnedSupport"), repeat("y"))
-        x = [*forces_in_beams, *rs_reactions, *ps_x_reactions, *ps_y_reactions]
-
-        # joint equilibrium equations
-        for joint in self.joints:
-            ax = [0] * len(x)
-            ay = [0] * len(x)
-            for beam in self.linked_beams(joint):
-                ax[x.index((beam, ""))] = cos(beam_angle(beam, joint))
-                ay[x.index((beam, ""))] = sin(beam_angle(beam, joint))
-            if joint["type"] == "RollerSupport":
-                ax[x.index((joint, ""))] = cos(radians(joint["angle"]))
-                ay[x.index((joint, ""))] = sin(radians(joint["angle"]))
-            if joint["type"] == "PinnedSupport":
-                ax[x.index((joint, "x"))] = 1
-                ay[x.index((joint, "y"))] = 1
-            a += [ax, ay]
-
-            known_forces = self.linked_forces(joint)
-            Fx_in_joint = sum(force_x_value(f) for f in known_forces)
-            Fy_in_joint = -sum(force_y_value(f) for f in known_forces)
-            b += [Fx_in_joint, Fy_in_joint]
-
-        # check that system has exactly one solution
-        # https://en.wikipedia.org/wiki/Rouché–Capelli_theorem
-        if len(x) > numpy.linalg.matrix_rank(a):
-            # https://en.wikipedia.org/wiki/Statically_indeterminate
-            raise ValueError("truss is statically indeterminate")
-        a_b = numpy.concatenate((numpy.matrix(a).T, numpy.matrix(b))).T # (a|b)
-        if numpy.linalg.matrix_rank(a) < numpy.linalg.matrix_rank(a_b):
-            raise ValueError("unbalanced truss")
-
-        x_names = [i[0]["id"] + i[1] for i in x]
-        x_values = numpy.linalg.lstsq(a, b, rcond=None)[0]
-        return dict(zip(x_names, x_values))
+        varying = dict(PinJoint=("x", "y"), PinnedSupport=("x", "y"),
+                       RollerSupport=("x", "y", "angle"),
+                       Force=("angle", "value"))
+        model = self.arrays
+        joints = model.joint_index
+        forces = {}  # first force with given id wins
+        for n, force_id in enumerate(model.force_ids):
+            forces.setdefault(force_id, n)
+        overrides = []
+        for item_id, fields in parameters.items():
+            item = self.find_by_id(item_id) or {}
+            for field, values in fields.items():
+                if field not in varying.get(item.get("type"), ()):
+                    raise ValueError(f"{field} of {item_id} can't be varied")
+                if item["type"] == "Force":
+                    overrides.append((f"force_{field}", (forces[item_id],),
+                                      values))
+                elif field == "angle":
+                    overrides.append(("angle", (joints[item_id],), values))
+                else:
+                    index = joints[item_id], "xy".index(field)
+                    overrides.append(("xy", index, values))
+        solver = import_solver()
+        values, indeterminate, unbalanced = solver.sweep(model, overrides)
+        return dict(names=model.unknowns_names(), values=values,
+                    indeterminate=indeterminate, unbalanced=unbalanced)
+
+    def __factorize(self, sparse):
+        """Return unknowns names and factorization cached till geometry."""
+        self.__factorization = import_solver().factorize_model(
+            self.arrays, sparse, self.__factorization)
+        return self.__factorization[1], self.__factorization[3]
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parametric trusses, e.g. to benchmark calculator on trusses of any size.
+
+Each generator returns tuple of items of statically determinate truss.
+Bridge trusses are made of spans of given number of panels, each span is
+supported by pinned support at the left and roller support at the right
+and loaded by downward force at each joint of the top chord. Spans stand
+one panel apart.
+"""
+
+
+def warren(panels, spans=1, width=2.0, height=1.5):
+    """Return Warren truss: diagonals alternate, no verticals."""
+    return _spans(_warren_span, panels, spans, width, height)
+
+
+def pratt(panels, spans=1, width=2.0, height=2.0):
+    """
+    Return Pratt truss (at least 2 panels per span): verticals and
+    diagonals sloping down towards center of span.
+    """
+    return _spans(_vertical_span, panels, spans, width, height, True)
+
+
+def howe(panels, spans=1, width=2.0, height=2.0):
+    """
+    Return Howe truss (at least 2 panels per span): verticals and
+    diagonals sloping up towards center of span.
+    """
+    return _spans(_vertical_span, panels, spans, width, height, False)
+
+
+def k_truss(panels, spans=1, width=2.0, height=3.0):
+    """
+    Return K-truss: each vertical but the first is split in the middle
+    and two diagonals of previous panel meet there.
+    """
+    return _spans(_k_span, panels, spans, width, height)
+
+
+def grid(columns, rows, size=1.0):
+    """
+    Return grid of columns x rows square cells supported at the bottom
+    corners and loaded at the top row. Cells of the bottom row and of the
+    left column are braced with diagonals, that is the least bracing that
+    makes grid rigid.
+    """
+    builder = Builder()
+    joints = [[builder.joint(c * size, r * size, first=not c and not r,
+                             last=c == columns and not r)
+               for c in range(columns + 1)] for r in range(rows + 1)]
+    for r, row in enumerate(joints):
+        for c, joint in enumerate(row):
+            if c:
+                builder.beam(row[c - 1], joint)
+            if r:
+                builder.beam(joints[r - 1][c], joint)
+            if r and c and (r == 1 or c == 1):
+                builder.beam(joints[r - 1][c - 1], joint)
+    builder.load(joints[-1])
+    return tuple(builder.items)
+
+
+def _spans(span, panels, spans, width, *args):
+    builder = Builder()
+    for i in range(spans):
+        builder.origin = i * (panels + 1) * width
+        span(builder, panels, width, *args)
+    return tuple(builder.items)
+
+
+def _bottom_chord(builder, panels, width):
+    return [builder.joint(i * width, 0.0, first=not i, last=i == panels)
+            for i in range(panels + 1)]
+
+
+def _warren_span(builder, panels, width, height):
+    bottom = _bottom_chord(builder, panels, width)
+    top = [builder.joint((i + 0.5) * width, height) for i in range(panels)]
+    for i in range(panels):
+        builder.beam(bottom[i], bottom[i + 1])
+        builder.beam(bottom[i], top[i])
+        builder.beam(top[i], bottom[i + 1])
+        if i:
+            builder.beam(top[i - 1], top[i])
+    builder.load(top)
+
+
+def _vertical_span(builder, panels, width, height, towards_center):
+    bottom = _bottom_chord(builder, panels, width)
+    top = [None] + [builder.joint(i * width, height)
+                    for i in range(1, panels)]
+    builder.beam(bottom[0], top[1])  # end panels are triangles
+    for i in range(panels):
+        builder.beam(bottom[i], bottom[i + 1])
+    for i in range(1, panels):
+        builder.beam(bottom[i], top[i])
+    for i in range(1, panels - 1):
+        builder.beam(top[i], top[i + 1])
+        if (2 * i + 1 < panels) == towards_center:  # down to the right
+            builder.beam(top[i], bottom[i + 1])
+        else:
+            builder.beam(bottom[i], top[i + 1])
+    builder.beam(top[panels - 1], bottom[panels])
+    builder.load(top[1:])
+
+
+def _k_span(builder, panels, width, height):
+    bottom = _bottom_chord(builder, panels, width)
+    top = [builder.joint(i * width, height) for i in range(panels + 1)]
+    builder.beam(bottom[0], top[0])
+    for i in range(1, panels + 1):
+        middle = builder.joint(i * width, height / 2)
+        builder.beam(bottom[i - 1], bottom[i])
+        builder.beam(top[i - 1], top[i])
+        builder.beam(bottom[i], middle)
+        builder.beam(middle, top[i])
+        builder.beam(bottom[i - 1], middle)
+        builder.beam(top[i - 1], middle)
+    builder.load(top)
+
+
+class Builder:
+    """Collect items of truss giving them ids."""
+    def __init__(self):
+        self.items = []
+        self.origin = 0.0  # x of joints is relative to it
+        self.__counts = {}
+
+    def joint(self, x, y, first=False, last=False):
+        """Add joint, the first is pinned support, the last - roller one."""
+        if first:
+            item = dict(type="PinnedSupport", y=y)
+        elif last:
+            item = dict(type="RollerSupport", y=y, angle=90.0)
+        else:
+            item = dict(type="PinJoint", y=y)
+        item["x"] = self.origin + x
+        return self.__add(item)["id"]
+
+    def beam(self, end1, end2):
+        self.__add(dict(type="Beam", end1=end1, end2=end2))
+
+    def load(self, joints, value=1.0):
+        for joint in joints:
+            self.__add(dict(type="Force", applied_to=joint, angle=-90.0,
+                            value=value))
+
+    def __add(self, item):
+        prefix = "".join(c for c in item["type"] if c.isupper())
+        if item["type"] in ("Beam", "Force"):
+            prefix = prefix[0]
+        self.__counts[prefix] = self.__counts.get(prefix, 0) + 1
+        item["id"] = f"{prefix}{self.__counts[prefix]}"
+        self.items.append(item)
+        return item
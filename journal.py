@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only journal of truss edits kept next to the model file.
+
+Truss is stored as model file (base) plus journal "<model file>.journal"
+in JSON Lines format: header with digest of base content the journal
+applies to, then one line per change (as listed in "truss modified"
+message) or snapshot of all items, and checkpoint lines written by
+explicit saves. Changes before the last checkpoint are saved ones, changes
+after it are edits that were not saved (e.g. because application crashed)
+and are recovered on load. Journal that doesn't belong to base is set
+aside rather than overwritten.
+"""
+import hashlib
+import json
+import os
+from domain import History, Truss
+
+SUFFIX = ".journal"
+ORPHANED_SUFFIX = ".orphaned"  # of journal set aside
+COMPACT_AFTER = 1000  # items referenced by journal before it is compacted
+
+
+class Journal:
+    def __init__(self, truss, filename):
+        self.__truss = truss
+        self.filename = filename
+        self.path = filename + SUFFIX
+        self.__file = None
+        self.__size = 0  # number of items referenced by journal
+        self.__compacted = 0  # size of journal when it was compacted
+        self.__stale = True  # journal doesn't belong to base
+        self.__valid_length = None  # of journal with damaged last line
+        self.__replaying = False
+        self.orphaned = 0  # changes in journal of other base, not loaded
+
+    def load(self, unsaved=True):
+        """
+        Load base and replay saved changes from journal, and unsaved ones as
+        well if unsaved is True. Base may be absent only if journal exists
+        (truss was never saved); if such journal is damaged (e.g. empty),
+        it is discarded and truss is empty. Return number of unsaved changes
+        replayed. Number of changes of journal that doesn't belong to base
+        is left in orphaned.
+        """
+        saved, not_saved = self.__read()
+        self.__replaying = True  # don't record changes being replayed
+        try:
+            with self.__truss.batch():
+                if os.path.exists(self.filename) or \
+                        self.__stale and not os.path.exists(self.path):
+                    self.__truss.load_from(self.filename)
+                else:
+                    if self.__stale:
+                        self.discard()
+                    self.__truss.new()
+                replay(self.__truss,
+                       saved + (not_saved if unsaved else []))
+        finally:
+            self.__replaying = False
+        self.__size = self.__compacted = size(*saved, *not_saved)
+        return len(not_saved) if unsaved else 0
+
+    def record(self, message):
+        """Observer callback, append change of truss to journal."""
+        if self.__replaying or message.get("action") != "truss modified" \
+                or not History.size(message):
+            return
+        strip = self.__truss.strip
+        change = dict(added=[strip(i) for i in message["added"]],
+                      removed=[strip(i) for i in message["removed"]],
+                      modified=[(strip(old), strip(new))
+                                for old, new in message["modified"]])
+        self.__write(change)
+        self.__size += History.size(change)
+        if self.__size > max(COMPACT_AFTER, 2 * self.__compacted,
+                             self.__truss.items_count):
+            self.__compact_journal()
+
+    def save(self):
+        """
+        Mark recorded changes saved. Write whole truss to base instead if
+        there is no base yet or journal grew as big as truss (e.g. holds its
+        snapshot), so cost of save doesn't depend on truss size.
+        """
+        if os.path.exists(self.filename) and \
+                self.__size < max(COMPACT_AFTER, self.__truss.items_count):
+            self.__write(dict(checkpoint=True), sync=True)
+        else:
+            self.compact()
+
+    def save_as(self, filename):
+        """Write whole truss to new base and start journal of it."""
+        self.__set_aside()
+        old_path = self.path
+        self.filename, self.path = filename, filename + SUFFIX
+        self.compact()
+        if old_path != self.path and os.path.exists(old_path):
+            os.remove(old_path)
+
+    def compact(self):
+        """Write whole truss to base and start empty journal of it."""
+        name, extension = os.path.splitext(self.filename)
+        temporary = name + ".tmp" + extension  # so format is kept
+        self.__truss.save_as(temporary)
+        os.replace(temporary, self.filename)
+        self.discard()
+
+    def discard(self):
+        """Forget all changes recorded since base was written."""
+        self.close()
+        self.__size = self.__compacted = 0
+        self.__stale = True
+        self.__set_aside()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __read(self):
+        """Return saved and unsaved changes if journal belongs to base."""
+        lines = self.__lines()
+        self.__stale = not lines or lines[0].get("base") != self.__stamp()
+        self.orphaned = len(lines) - 1 if self.__stale and lines else 0
+        if self.__stale:
+            return [], []
+        return split(lines[1:])
+
+    def __lines(self):
+        lines = []
+        length = 0
+        self.__valid_length = None
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    lines.append(json.loads(line))
+                    length += len(line)
+        except OSError:
+            pass
+        except ValueError:  # last line was not written completely
+            self.__valid_length = length
+        return lines
+
+    def __stamp(self):
+        """Return digest of base content (None if no base)."""
+        digest = hashlib.sha256()
+        try:
+            with open(self.filename, "rb") as f:
+                for chunk in iter(lambda: f.read(2 ** 20), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def __set_aside(self):
+        """Keep journal of other base, so its changes are not lost."""
+        if self.orphaned and os.path.exists(self.path):
+            os.replace(self.path, self.path + ORPHANED_SUFFIX)
+        self.orphaned = 0
+
+    def __compact_journal(self):
+        """Replace changes in journal with snapshots of truss."""
+        self.close()
+        self.__compacted = self.__size  # even if journal stays as it is
+        header, *lines = self.__lines()
+        saved, not_saved = split(lines)
+        lines = []
+        if saved:
+            truss = self.__truss
+            if not_saved:  # saved truss is base with saved changes
+                truss = Truss()
+                try:
+                    truss.load_from(self.filename)
+                    replay(truss, saved)
+                except (OSError, ValueError):
+                    return
+            lines += [snapshot(truss), dict(checkpoint=True)]
+        if not_saved:
+            lines.append(snapshot(self.__truss))
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            for line in [header] + lines:
+                f.write(json.dumps(line) + "\n")
+            f.flush()
+            os.fsync(f.fileno())  # saved changes are only here
+        os.replace(temporary, self.path)
+        self.__size = self.__compacted = size(*lines)
+
+    def __write(self, line, sync=False):
+        if self.__file is None:
+            if self.__valid_length is not None and not self.__stale:
+                os.truncate(self.path, self.__valid_length)
+                self.__valid_length = None
+            if self.__stale:
+                self.__set_aside()
+            self.__file = open(self.path, "w" if self.__stale else "a")
+            if self.__stale:
+                self.__file.write(json.dumps(dict(base=self.__stamp())) + "\n")
+                self.__stale = False
+        self.__file.write(json.dumps(line) + "\n")
+        self.__file.flush()  # survives crash of application
+        if sync:
+            os.fsync(self.__file.fileno())  # survives crash of system
+
+
+def split(lines):
+    """Return saved and unsaved changes of journal lines after header."""
+    changes = []
+    saved = 0  # number of changes before the last checkpoint
+    for line in lines:
+        if line.get("checkpoint"):
+            saved = len(changes)
+        else:
+            changes.append(line)
+    return changes[:saved], changes[saved:]
+
+
+def replay(truss, changes):
+    for change in changes:
+        if "snapshot" in change:
+            truss.items = change["snapshot"]
+        else:
+            truss.apply_change(change)
+
+
+def snapshot(truss):
+    return dict(snapshot=[truss.strip(i) for i in truss.items])
+
+
+def size(*changes):
+    """Return number of items changes and snapshots reference."""
+    return History.size(*changes) + \
+        sum(len(c.get("snapshot", ())) for c in changes)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3.7
 # -*- coding: utf-8 -*-
 from cmath import exp
+from contextlib import contextmanager
 from math import radians
 from re import sub
 
@@ -20,10 +21,40 @@ def rotate(center, target, angle):
 class Observable:
     def __init__(self):
         self.observer_callbacks = []
+        self.__held = 0
+        self.__held_messages = []
 
     def notify(self, message):
+        if self.__held:
+            self.__held_messages.append(message)
+            return
         for callback in self.observer_callbacks:
             callback(message)
 
+    @contextmanager
+    def hold_notifications(self):
+        """
+        Defer notifications until the end of with block (the outermost one
+        if nested), then send messages returned by coalesce.
+        """
+        self.__held += 1
+        try:
+            yield self
+        finally:
+            self.__held -= 1
+            if not self.__held:
+                messages, self.__held_messages = self.__held_messages, []
+                for message in self.coalesce(messages):
+                    self.notify(message)
+
+    @staticmethod
+    def coalesce(messages):
+        """Return messages to send instead of held ones (repeats dropped)."""
+        unique = []
+        for message in messages:
+            if message not in unique:
+                unique.append(message)
+        return unique
+
     def append_observer_callback(self, callback):
         self.observer_callbacks.append(callback)
@@ -1,25 +1,59 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from collections import OrderedDict
+import os
 from tkinter import (Button, Frame, PhotoImage, Tk,
                      BOTH, FLAT, LEFT, RAISED, TOP, X, Y, YES)
 from tkinter.filedialog import askopenfilename, asksaveasfilename
-from tkinter.messagebox import showwarning
+from tkinter.messagebox import showinfo, showwarning
 from tkinter.simpledialog import askfloat  # type: ignore
+from cache import ResultCache
+from calculation import Calculation
 from domain import History, Truss
+from journal import Journal, ORPHANED_SUFFIX
 from view import TrussView, ItemEditState, TrussPropertyEditor
 
 
-# global variables
-root = Tk()
-truss = Truss()
-history = History(truss.items)
-truss_view = TrussView(root, truss, name="truss view")
-property_editor = TrussPropertyEditor(root, name="property editor")
-state = ItemEditState()
+# global variables, created in main() so importing this module is cheap
+root = None
+truss = None
+history = None
+truss_view = None
+property_editor = None
+state = None
+journal = None
+calculation = None
+poll_job = None
+results_cache = ResultCache()
+calculated_hash = None  # content hash of truss being calculated
+live = False  # recalculate after each edit
+live_job = None
 images = {}
+# edits of truss that was never saved are journaled here
+UNTITLED = os.path.join(os.path.expanduser("~"), ".simple_truss_calculator",
+                        "untitled.json")
+FILE_TYPES = [("Truss Data", ".json"), ("Truss Data (JSON Lines)", ".jsonl"),
+              ("Truss Data (binary)", ".npy")]
+HISTORY_DEPTH = 1000  # undo steps
+HISTORY_INTERVAL = 0.2  # seconds, faster edits are undone together
+FRAME_INTERVAL = 16  # ms, mouse moves are processed at most once per frame
+POLL_INTERVAL = 50  # ms between checks of background calculation
+LIVE_DELAY = 300  # ms after the last edit before live recalculation
+pointer = None  # the latest mouse position not processed yet
+motion_job = None
 
 def main():
+    global root, truss, history, truss_view, property_editor, state
+    global calculation
+    root = Tk()
+    truss = Truss()
+    history = History(truss.apply_change, max_depth=HISTORY_DEPTH,
+                      interval=HISTORY_INTERVAL)
+    truss_view = TrussView(root, truss, name="truss view")
+    property_editor = TrussPropertyEditor(root, name="property editor")
+    state = ItemEditState()
+    calculation = Calculation()
+
     root.title("Simple Truss Calculator")
     toolbar = create_toolbar()
     toolbar.pack(side=TOP, fill=X)
@@ -31,7 +65,8 @@ def main():
     truss.append_observer_callback(truss_update)
     history.append_observer_callback(history_update)
     property_editor.append_observer_callback(state_update)
-    new()
+    calculation.append_observer_callback(calculation_update)
+    recover()
 
     root.mainloop()
 
@@ -51,15 +86,22 @@ def create_toolbar():
                            "beam": lambda: state.new("Beam"),
                            "force": lambda: state.new("Force")})
     for i, f in buttons.items():
-        images[i] = PhotoImage(file=f"img/{i}.gif")  # prevent GC
-        Button(toolbar, name=i, image=images[i], relief=FLAT, command=f
+        Button(toolbar, name=i, text=i, relief=FLAT, command=f
                ).pack(side=LEFT, padx=2, pady=2)
+    root.after_idle(load_toolbar_images, toolbar)
     return toolbar
 
+def load_toolbar_images(toolbar):
+    """Decode images when window is shown, buttons have text till then."""
+    for button in toolbar.winfo_children():
+        i = button.winfo_name()
+        images[i] = PhotoImage(file=f"img/{i}.gif")  # prevent GC
+        button["image"] = images[i]
+
 def bind_hotkeys():
     root.bind("<Delete>", on_del_click)
     root.bind('<Escape>', lambda _: state_update(dict(action="cancel")))
-    root.bind("<Control-n>", lambda _: truss.new())
+    root.bind("<Control-n>", lambda _: new())
     root.bind("<Control-l>", lambda _: load())
     root.bind("<Control-s>", lambda _: save())
     root.bind("<Control-z>", lambda _: undo())
@@ -67,6 +109,7 @@ def bind_hotkeys():
     root.bind("<Control-a>", lambda _: truss_view.create_labels())
     root.bind("<Control-u>", lambda _: truss_view.refresh())
     root.bind("<Control-c>", lambda _: calculate())
+    root.bind("<Control-e>", lambda _: toggle_live())
     root.bind("<Control-p>", lambda _: state.new("PinnedSupport"))
     root.bind("<Control-r>", lambda _: state.new("RollerSupport"))
     root.bind("<Control-j>", lambda _: state.new("PinJoint"))
@@ -76,21 +119,42 @@ def bind_hotkeys():
     truss_view.bind("<Motion>", on_mouse_move)
 
 def on_click(event):
+    cancel_motion()  # click is at the latest position anyway
     x, y = truss_view.to_truss_pos(event.x, event.y)
     msg = dict(action="click", x=x, y=y)
-    items_under_cursor = truss_view.find_withtag("current")
-    if items_under_cursor:
-        item = truss.find_by_id(truss_view.gettags(items_under_cursor[0])[1])
-        if item:
-            msg.update(dict(action="item click", item=item))
+    if state.placing_node:  # click the joint preview snapped to
+        item = truss_view.joint_at(event.x, event.y)
+    else:
+        item = truss_view.item_at(event.x, event.y)
+    if item:
+        msg.update(dict(action="item click", item=item))
     state_update(state.process(msg))
 
 def on_del_click(_):
     state_update(state.process(dict(action="delete")))
 
 def on_mouse_move(event):
-    x, y = truss_view.to_truss_pos(event.x, event.y)
-    state_update(state.process(dict(action="move", x=x, y=y)))
+    """Remember position, it is processed with later ones in next frame."""
+    global pointer, motion_job
+    pointer = event.x, event.y
+    if motion_job is None:
+        motion_job = root.after(FRAME_INTERVAL, process_motion)
+
+def process_motion():
+    global motion_job
+    motion_job = None
+    x, y = truss_view.to_truss_pos(*pointer)
+    msg = dict(action="move", x=x, y=y)
+    joint = truss_view.joint_at(*pointer)
+    if joint:
+        msg["item"] = joint  # to snap to
+    state_update(state.process(msg))
+
+def cancel_motion():
+    global motion_job
+    if motion_job is not None:
+        root.after_cancel(motion_job)
+        motion_job = None
 
 def history_update(msg):
     if msg["action"] == "history changed":
@@ -104,8 +168,13 @@ def truss_update(msg):
         invalid = ", ".join(f"{i['type']} {i['id']}" for i in msg["items"])
         showwarning("Warning", f"Invalid items were removed: {invalid}")
     elif msg["action"] == "truss modified":
+        calculation.cancel()  # results would be of previous truss
         property_editor.clear()
-        history.append(truss.items)
+        if journal:  # else truss is being replaced, history is reset
+            history.append(msg)
+            journal.record(msg)
+        if live:
+            schedule_live_calculation()
 
 def state_update(msg):
     item = msg.get("item")
@@ -113,16 +182,18 @@ def state_update(msg):
     action = msg.get("action")
     if action == "select":
         property_editor.show_properties(item)
-    if action == "cancel":
+    if action in ("cancel", "deselect"):
         state.default()
         property_editor.clear()
+    if action == "cancel":  # Escape or Cancel button, not click on canvas
+        calculation.cancel()
     if action == "delete":
         truss.remove(item)
     if action == "update tmp":
         property_editor.show_properties(item)
-        truss_view.delete("temporary")
-        truss_view.create_item({**item, "id": "temporary"})
-        truss_view.tag_lower("temporary")
+        truss_view.show_preview(item)
+    else:
+        truss_view.hide_preview()
     if action == "finish editing":
         state.default()
         if item.get("id"):
@@ -135,7 +206,7 @@ def state_update(msg):
         if item.get("value") is None:
             item["value"] = askfloat("Force value", "Please enter force value",
                                      initialvalue=0, parent=root)
-        action = "finish editing" if item["value"] else "cancel"
+        action = "finish editing" if item["value"] else "deselect"
         state_update(dict(action=action, item=item))
     if action == "edit field":
         if msg["field"] in item:
@@ -146,43 +217,161 @@ def state_update(msg):
 
 def calculate():
     state.default()
-    try:
-        property_editor.show_results(truss.calculate())
+    start_calculation()
+
+def start_calculation():
+    """
+    Show cached results of truss with the same content or start calculation
+    on background thread (results are shown later).
+    """
+    global poll_job, calculated_hash
+    calculated_hash = truss.content_hash()
+    outcome = results_cache.get(calculated_hash)
+    if outcome is not None:
+        calculation.cancel()
+        show_outcome(outcome)
+        return
+    calculation.start(truss.arrays)
+    if state.idle:
+        property_editor.show_progress("starting")
+    if poll_job is None:
+        poll_job = root.after(POLL_INTERVAL, poll_calculation)
+
+def toggle_live():
+    """Turn recalculation after each edit on or off."""
+    global live
+    live = not live
+    root.title("Simple Truss Calculator" + (" (live)" if live else ""))
+    if live:
+        start_calculation()
+
+def schedule_live_calculation():
+    """Calculate when there were no edits for LIVE_DELAY."""
+    global live_job
+    if live_job is not None:
+        root.after_cancel(live_job)
+    live_job = root.after(LIVE_DELAY, live_calculation)
+
+def live_calculation():
+    global live_job
+    live_job = None
+    if live:
+        start_calculation()
+
+def poll_calculation():
+    global poll_job
+    poll_job = None
+    if calculation.poll():
+        poll_job = root.after(POLL_INTERVAL, poll_calculation)
+
+def calculation_update(msg):
+    if msg["action"] == "calculation progress":
+        if state.idle:
+            property_editor.show_progress(msg["stage"])
+    elif msg["action"] == "calculation finished":
+        outcome = dict(results=msg["results"])
+        results_cache.put(calculated_hash, outcome)
+        show_outcome(outcome)
+    elif msg["action"] == "calculation failed":
+        outcome = dict(error=str(msg["error"]))
+        if isinstance(msg["error"], ValueError):  # caused by truss itself
+            results_cache.put(calculated_hash, outcome)
+        show_outcome(outcome)
+
+def show_outcome(outcome):
+    """Show results or error, leave panel alone if item is edited."""
+    if "results" in outcome:
+        if state.idle:
+            property_editor.show_results(outcome["results"])
         truss_view.create_labels()
-    except ValueError as error:
-        showwarning("Calculate", error)
+    elif live:  # no dialog after every edit
+        if state.idle:
+            property_editor.show_error(outcome["error"])
+    else:
+        property_editor.clear()
+        showwarning("Calculate", outcome["error"])
+
+def recover():
+    """
+    Restore edits of untitled truss lost because application crashed. If
+    they can't be restored, application starts with empty truss anyway.
+    """
+    global journal
+    os.makedirs(os.path.dirname(UNTITLED), exist_ok=True)
+    journal = Journal(truss, UNTITLED)
+    try:
+        if os.path.exists(journal.path) and journal.load():
+            showinfo("Recover",
+                     "Unsaved changes of untitled truss were restored")
+        warn_orphaned(journal)
+    except Exception as error:  # pylint: disable=broad-except
+        damaged, journal = journal, None  # clearing truss is not an edit
+        truss.new()
+        damaged.discard()
+        journal = damaged
+        showwarning("Recover", "Unsaved changes of untitled truss could not "
+                               f"be restored: {error}")
+    history.reset()
+
+def warn_orphaned(opened):
+    """Tell that journal of base changed elsewhere was not replayed."""
+    if opened.orphaned:
+        showwarning("Recover", f"{opened.orphaned} journaled changes were "
+                               "not restored, file was changed elsewhere. "
+                               "They are kept in "
+                               f"{opened.path + ORPHANED_SUFFIX}")
 
 def new():
+    global journal
+    journal.close()
+    journal = None  # clearing truss is not an edit of previous file
     truss.new()
-    history.reset(truss.items)
+    journal = Journal(truss, UNTITLED)
+    journal.discard()
+    history.reset()
 
 def load():
+    global journal
     filename = askopenfilename(defaultextension=".json",
-                               filetypes=[("Truss Data", ".json")],
+                               filetypes=FILE_TYPES,
                                title="Load Truss")
     if filename:
+        previous, journal = journal, None
+        items = truss.items
         try:
             state.default()
-            truss.load_from(filename)
-            history.reset(truss.items)
-        except IOError as error:
+            opened = Journal(truss, filename)
+            if opened.load():
+                showinfo("Recover", "Unsaved changes were restored")
+            warn_orphaned(opened)
+            if previous.filename == UNTITLED:
+                previous.discard()  # user switched to other truss
+            previous.close()
+            journal = opened
+            history.reset()
+        except Exception as error:  # pylint: disable=broad-except
+            truss.items = items  # file may be loaded partially
+            journal = previous
             showwarning("Failed to load data", error)
 
 def save():
     filename = asksaveasfilename(defaultextension=".json",
-                                 filetypes=[("Truss Data", ".json")],
+                                 filetypes=FILE_TYPES,
                                  title="Save Truss")
     if filename:
         try:
-            truss.save_as(filename)
+            if os.path.abspath(filename) == os.path.abspath(journal.filename):
+                journal.save()  # only checkpoint, unless compaction is due
+            else:
+                journal.save_as(filename)
         except IOError as error:
             showwarning("Failed to save data", error)
 
 def undo():
-    truss.items = history.undo()
+    history.undo()
 
 def redo():
-    truss.items = history.redo()
+    history.redo()
 
 if __name__ == "__main__":
     main()
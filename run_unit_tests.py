@@ -6,6 +6,16 @@ from unit_tests.test_observable import TestObservable
 from unit_tests.test_history import TestHistory
 from unit_tests.test_truss import TestTruss
 from unit_tests.test_item_edit_state import TestItemEditState
+from unit_tests.test_solver import TestSolver
+from unit_tests.test_batch import TestBatch
+from unit_tests.test_startup import TestStartup
+from unit_tests.test_storage import TestStorage
+from unit_tests.test_journal import TestJournal
+from unit_tests.test_spatial import TestSpatial
+from unit_tests.test_calculation import TestCalculation
+from unit_tests.test_cache import TestCache
+from unit_tests.test_generators import TestGenerators
+from unit_tests.test_benchmark import TestBenchmark
 
 
 if __name__ == '__main__':
@@ -15,5 +25,15 @@ if __name__ == '__main__':
     suite.addTest(unittest.makeSuite(TestHistory))
     suite.addTest(unittest.makeSuite(TestTruss))
     suite.addTest(unittest.makeSuite(TestItemEditState))
+    suite.addTest(unittest.makeSuite(TestSolver))
+    suite.addTest(unittest.makeSuite(TestBatch))
+    suite.addTest(unittest.makeSuite(TestStartup))
+    suite.addTest(unittest.makeSuite(TestStorage))
+    suite.addTest(unittest.makeSuite(TestJournal))
+    suite.addTest(unittest.makeSuite(TestSpatial))
+    suite.addTest(unittest.makeSuite(TestCalculation))
+    suite.addTest(unittest.makeSuite(TestCache))
+    suite.addTest(unittest.makeSuite(TestGenerators))
+    suite.addTest(unittest.makeSuite(TestBenchmark))
     runner = unittest.TextTestRunner()
     runner.run(suite)
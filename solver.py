@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+import numpy  # type: ignore # pylint: disable=import-error
+from arrays import PINNED, ROLLER
+try:
+    from scipy.sparse import csc_matrix  # type: ignore
+    from scipy.sparse.linalg import splu  # type: ignore
+except ImportError:  # SciPy is optional, dense solver is used without it
+    csc_matrix = splu = None
+
+SPARSE_THRESHOLD = 400  # number of unknowns starting from which sparse is used
+MAX_UPDATE_RANK = 32  # changed columns that are patched without refactoring
+MAX_UPDATE_CONDITION = 1e8  # worse conditioned updates are unsafe
+
+# coefficients in coordinate format as arrays of rows, columns and values
+Coordinates = namedtuple("Coordinates", ("rows", "columns", "values"))
+
+
+def sparse_available():
+    return splu is not None
+
+
+def solve(shape, a, b, sparse=None):
+    """
+    Solve system of linear equations a·x = b.
+
+    Coefficients matrix a is given in coordinate format: iterable of
+    (row, column, value) triplets or Coordinates, all omitted coefficients
+    are zeros.
+    Raise ValueError if system has no solution or infinitely many.
+    """
+    return factorize(shape, a, sparse).solve(b)
+
+
+def factorize(shape, a, sparse=None):
+    """
+    Factorize coefficients matrix a given in coordinate format.
+    If sparse is None, sparse factorization is chosen automatically for
+    systems with many unknowns (provided SciPy is installed).
+    Raise ValueError if system can not have exactly one solution.
+    """
+    return factorization_of(assemble(shape, a, sparse))
+
+
+def update(factorization, shape, a):
+    """
+    Return factorization of coefficients matrix a (given in coordinate
+    format) that differs from factorized one in a few columns only.
+    Square matrices are patched with low rank update, everything else
+    (too many changed columns, numerically unsafe update, other shape) is
+    factorized from scratch.
+    """
+    base = getattr(factorization, "base", factorization)
+    matrix = assemble(shape, a, sparse=not is_dense(base.matrix))
+    if matrix.shape != base.shape or shape[0] != shape[1]:
+        return factorization_of(matrix)
+    changed = numpy.asarray(abs(matrix - base.matrix).sum(axis=0)).ravel()
+    columns = numpy.flatnonzero(changed)
+    if not columns.size:
+        return base
+    if columns.size <= MAX_UPDATE_RANK:
+        try:
+            return UpdatedFactorization(base, matrix, columns)
+        except numpy.linalg.LinAlgError:
+            pass
+    return factorization_of(matrix)
+
+
+def assemble(shape, a, sparse=None):
+    """Build dense matrix or sparse one (CSC) from coordinate format."""
+    if isinstance(a, Coordinates):
+        rows, columns, values = a
+    else:
+        rows, columns, values = (list(i) for i in zip(*a)) if a else \
+            ([], [], [])
+    if sparse is None:
+        sparse = sparse_available() and shape[1] >= SPARSE_THRESHOLD
+    if sparse and shape[1]:
+        return csc_matrix((values, (rows, columns)), shape)
+    dense = numpy.zeros(shape)
+    dense[rows, columns] = values
+    return dense
+
+
+def factorization_of(matrix):
+    if is_dense(matrix):
+        return DenseFactorization(matrix)
+    return SparseFactorization(matrix)
+
+
+def is_dense(matrix):
+    return isinstance(matrix, numpy.ndarray)
+
+
+class Factorization:
+    def solve(self, b):
+        """
+        Solve a·x = b, b may be vector or matrix with constants vector in
+        each column. Raise ValueError if any of the systems has no solution.
+        """
+        x, balanced = self.least_squares(b)
+        if not numpy.all(balanced):
+            raise ValueError("unbalanced truss")
+        return x
+
+    def least_squares(self, b):
+        """Return solution and whether it satisfies a·x = b (per column)."""
+        raise NotImplementedError
+
+
+class DenseFactorization(Factorization):
+    """
+    Singular value decomposition a = u·s·vᵀ. Single decomposition gives
+    rank of a, consistency of a·x = b (Rouché–Capelli theorem) and solution.
+    https://en.wikipedia.org/wiki/Rouché–Capelli_theorem
+    """
+    def __init__(self, a):
+        self.matrix = a
+        self.shape = rows, columns = a.shape
+        if columns > rows:
+            # https://en.wikipedia.org/wiki/Statically_indeterminate
+            raise ValueError("truss is statically indeterminate")
+        if columns:
+            u, s, vt = numpy.linalg.svd(a, full_matrices=False)
+        else:
+            u, s, vt = numpy.zeros((rows, 0)), numpy.zeros(0), a[:0]
+        # same tolerance as numpy.linalg.matrix_rank uses
+        self.__eps = max(rows, columns + 1) * numpy.finfo(float).eps
+        if numpy.count_nonzero(s > s.max(initial=0) * self.__eps) < columns:
+            raise ValueError("truss is statically indeterminate")
+        self.__u, self.__s, self.__vt = u, s, vt
+
+    def least_squares(self, b):
+        b = numpy.asarray(b, dtype=float)
+        projection = self.__u.T @ b
+        residual = numpy.linalg.norm(b - self.__u @ projection, axis=0)
+        # b out of column space of a means that rank(a|b) > rank(a)
+        scale = numpy.maximum(self.__s.max(initial=0),
+                              numpy.linalg.norm(b, axis=0))
+        s = self.__s.reshape(-1, *(1,) * (b.ndim - 1))
+        return self.__vt.T @ (projection / s), residual <= scale * self.__eps
+
+
+class SparseFactorization(Factorization):
+    """
+    Sparse LU of square matrix a or of normal equations matrix aᵀ·a if a is
+    overdetermined. Rank is estimated from LU pivots.
+    """
+    def __init__(self, a):
+        self.matrix = a
+        self.shape = rows, columns = a.shape
+        if columns > rows:
+            raise ValueError("truss is statically indeterminate")
+        self.__a = a
+        self.__norm = numpy.sqrt((a.data ** 2).sum())  # Frobenius norm
+        square = a if rows == columns else (a.T @ a).tocsc()
+        try:
+            self.__lu = splu(square)
+        except RuntimeError:  # factor is exactly singular
+            raise ValueError("truss is statically indeterminate") from None
+        pivots = abs(self.__lu.U.diagonal())
+        if pivots.min() <= pivots.max() * columns * numpy.finfo(float).eps:
+            raise ValueError("truss is statically indeterminate")
+
+    def least_squares(self, b):
+        b = numpy.asarray(b, dtype=float)
+        rows, columns = self.__a.shape
+        if rows == columns:  # nonsingular (pivots are checked), so a·x = b
+            x = self.__lu.solve(b)
+            return x, numpy.ones(b.shape[1:], dtype=bool)
+        x = self.__lu.solve(self.__a.T @ b)
+        residual = numpy.linalg.norm(self.__a @ x - b, axis=0)
+        # backward error: residual is small relative to ‖a‖·‖x‖ + ‖b‖
+        scale = self.__norm * numpy.linalg.norm(x, axis=0) + \
+            numpy.linalg.norm(b, axis=0)
+        eps = numpy.finfo(float).eps
+        return x, residual <= numpy.maximum(numpy.sqrt(eps) * scale, eps)
+
+
+class UpdatedFactorization(Factorization):
+    """
+    Factorization of square matrix a' that differs from already factorized
+    a only in few columns: a' = a + d·eᵀ, where d holds differences of those
+    columns and e selects them. Sherman–Morrison–Woodbury formula gives
+    a'⁻¹·b = z - a⁻¹·d·c⁻¹·eᵀ·z, where z = a⁻¹·b and c = I + eᵀ·a⁻¹·d.
+    https://en.wikipedia.org/wiki/Woodbury_matrix_identity
+    Raise numpy.linalg.LinAlgError if update is numerically unsafe.
+    """
+    def __init__(self, base, a, columns):
+        self.base = base
+        self.matrix = a
+        self.shape = a.shape
+        d = a[:, columns] - base.matrix[:, columns]
+        d = d if is_dense(d) else d.toarray()
+        self.__ainv_d = base.least_squares(d)[0]
+        self.__columns = columns
+        self.__c = numpy.identity(len(columns)) + self.__ainv_d[columns]
+        # c close to singular means that a' is (close to) singular as well
+        s = numpy.linalg.svd(self.__c, compute_uv=False)
+        if s.min() * MAX_UPDATE_CONDITION < max(1, s.max()):
+            raise numpy.linalg.LinAlgError("unsafe low rank update")
+
+    def least_squares(self, b):
+        z, balanced = self.base.least_squares(b)
+        correction = numpy.linalg.solve(self.__c, z[self.__columns])
+        return z - self.__ainv_d @ correction, balanced
+
+
+def calculate(model, sparse=None, progress=None):
+    """
+    Solve truss given as arrays.TrussArrays and return dict mapping
+    unknowns names to values. progress (if given) is called with name of
+    each stage ("assembling", "checking determinacy", "solving") before it
+    starts, so it can report progress or stop calculation by raising.
+    """
+    report = progress or (lambda stage: None)
+    _, x_names, _, factorization = factorize_model(model, sparse,
+                                                   progress=report)
+    report("solving")
+    b = constants(model.shape[0], model.force_joint, model.force_angle,
+                  model.force_value)
+    return dict(zip(x_names, factorization.solve(b)))
+
+
+def factorize_model(model, sparse=None, cached=None, progress=None):
+    """
+    Factorize coefficients matrix of truss given as arrays.TrussArrays.
+    Return (key, unknowns names, joint ids, factorization), which may be
+    passed as cached to the next call: it is returned as is if geometry
+    (everything but forces) is the same, and patched with update() if
+    unknowns are the same, e.g. if only positions or angles of a few
+    joints changed. progress is called as in calculate().
+    """
+    report = progress or (lambda stage: None)
+    key = model.geometry(), sparse
+    if cached is not None and cached[0] == key:
+        return cached
+    report("assembling")
+    x_names = model.unknowns_names()
+    a = coefficients(model.kind, model.beam_ends, model.xy, model.angle)
+    report("checking determinacy")
+    if cached is not None and cached[0][1] == sparse and \
+            cached[1:3] == (x_names, model.joint_ids):
+        factorization = update(cached[3], model.shape, a)
+    else:
+        factorization = factorize(model.shape, a, sparse)
+    return key, x_names, model.joint_ids, factorization
+
+
+def sweep(model, overrides):
+    """
+    Solve many variants of one truss at once.
+
+    model is arrays.TrussArrays, overrides is sequence of (name, index,
+    values) where values (one per variant) replace model.name[index] (name
+    is one of "xy", "angle", "force_angle" and "force_value").
+    Return solutions (variants × unknowns, NaN if there is no unique
+    solution) and per variant indeterminate and unbalanced flags.
+    """
+    variants = {len(values) for *_, values in overrides} or {1}
+    if len(variants) > 1:
+        raise ValueError("all parameters must have the same number of values")
+    count = variants.pop()
+    arrays = {name: numpy.repeat(getattr(model, name)[numpy.newaxis], count,
+                                 axis=0)
+              for name in ("xy", "angle", "force_angle", "force_value")}
+    for name, index, values in overrides:
+        arrays[name][(slice(None), *index)] = values
+
+    rows, columns, values = coefficients(
+        model.kind, model.beam_ends, arrays["xy"], arrays["angle"])
+    a = numpy.zeros((count, *model.shape))
+    a[:, rows, columns] = values
+    b = constants(model.shape[0], model.force_joint, arrays["force_angle"],
+                  arrays["force_value"])
+    return solve_stack(a, b)
+
+
+def coefficients(kind, beam_ends, xy, angle):
+    """
+    Return rows, columns and values of nonzero coefficients of joints
+    equilibrium equations. kind holds type of each joint (pin joint, PINNED
+    or ROLLER support), beam_ends - indices of joints linked by each beam,
+    xy - joints coordinates (joints × 2) and angle - roller supports angles
+    (in degrees, ignored for other joints). xy and angle may have additional
+    leading dimensions (e.g. variants), then values have them as well.
+    Unknowns are forces in beams, roller supports reactions, pinned
+    supports x reactions and pinned supports y reactions in that order.
+    """
+    kind = numpy.asarray(kind, dtype=int)
+    ends = numpy.asarray(beam_ends, dtype=int).reshape(-1, 2)
+    xy = numpy.asarray(xy, dtype=float)
+    e1, e2 = ends[:, 0], ends[:, 1]
+    rollers = numpy.flatnonzero(kind == ROLLER)
+    pinned = numpy.flatnonzero(kind == PINNED)
+    beam_columns = numpy.arange(len(ends))
+    roller_columns = len(ends) + numpy.arange(len(rollers))
+    pinned_columns = len(ends) + len(rollers) + numpy.arange(len(pinned))
+
+    x, y = xy[..., 0], xy[..., 1]
+    angle1 = numpy.arctan2(y[..., e1] - y[..., e2], x[..., e1] - x[..., e2])
+    distinct = e1 != e2  # beam which ends are in one joint is linked once
+    e2 = e2[distinct]
+    angle2 = numpy.arctan2(y[..., e2] - y[..., e1[distinct]],
+                           x[..., e2] - x[..., e1[distinct]])
+    roller_angle = numpy.radians(numpy.asarray(angle, dtype=float)[
+        ..., rollers])
+    ones = numpy.ones(x.shape[:-1] + pinned.shape)
+
+    rows = numpy.concatenate((2 * e1, 2 * e1 + 1, 2 * e2, 2 * e2 + 1,
+                              2 * rollers, 2 * rollers + 1,
+                              2 * pinned, 2 * pinned + 1))
+    columns = numpy.concatenate((
+        beam_columns, beam_columns,
+        beam_columns[distinct], beam_columns[distinct],
+        roller_columns, roller_columns,
+        pinned_columns, pinned_columns + len(pinned)))
+    values = numpy.concatenate((
+        numpy.cos(angle1), numpy.sin(angle1),
+        numpy.cos(angle2), numpy.sin(angle2),
+        numpy.cos(roller_angle), numpy.sin(roller_angle), ones, ones),
+        axis=-1)
+    return Coordinates(rows, columns, values)
+
+
+def constants(rows, force_joint, force_angle, force_value):
+    """
+    Return constants vector (known forces) of joints equilibrium
+    equations. force_angle (in degrees) and force_value may have additional
+    leading dimensions (e.g. variants), then result has them as well.
+    """
+    joint = numpy.asarray(force_joint, dtype=int)
+    angle = numpy.radians(numpy.asarray(force_angle, dtype=float))
+    value = numpy.asarray(force_value, dtype=float)
+    b = numpy.zeros(angle.shape[:-1] + (rows,))
+    b_by_row = numpy.moveaxis(b, -1, 0)  # view, so b is updated in place
+    numpy.add.at(b_by_row, 2 * joint, numpy.moveaxis(value * numpy.cos(angle),
+                                                      -1, 0))
+    numpy.add.at(b_by_row, 2 * joint + 1,
+                 -numpy.moveaxis(value * numpy.sin(angle), -1, 0))
+    return b
+
+
+def constants_matrix(rows, cases):
+    """
+    Return constants matrix with one column per load case. cases is
+    sequence of (force_joint, force_angle, force_value) of each case.
+    """
+    b = numpy.zeros((rows, len(cases)))
+    for column, case in enumerate(cases):
+        b[:, column] = constants(rows, *case)
+    return b
+
+
+def solve_stack(a, b):
+    """
+    Solve stack of systems a[i]·x[i] = b[i] with one batched SVD.
+    Return solutions (NaN if there is no unique solution), indeterminate
+    and unbalanced flags for each system.
+    """
+    count, rows, columns = a.shape
+    eps = max(rows, columns + 1) * numpy.finfo(float).eps
+    x = numpy.full((count, columns), numpy.nan)
+    if columns > rows:
+        return x, numpy.ones(count, dtype=bool), numpy.zeros(count, dtype=bool)
+    if columns:
+        u, s, vt = numpy.linalg.svd(a, full_matrices=False)
+    else:
+        u, s, vt = numpy.zeros((count, rows, 0)), numpy.zeros((count, 0)), \
+            numpy.zeros((count, 0, 0))
+    s_max = s.max(axis=-1, initial=0)
+    rank = numpy.count_nonzero(s > s_max[:, numpy.newaxis] * eps, axis=-1)
+    indeterminate = rank < columns
+    projection = numpy.einsum("vmn,vm->vn", u, b)
+    residual = numpy.linalg.norm(
+        b - numpy.einsum("vmn,vn->vm", u, projection), axis=-1)
+    scale = numpy.maximum(s_max, numpy.linalg.norm(b, axis=-1))
+    unbalanced = ~indeterminate & (residual > scale * eps)
+    solved = ~(indeterminate | unbalanced)
+    x[solved] = numpy.einsum("vnk,vn->vk", vt[solved],
+                             projection[solved] / s[solved])
+    return x, indeterminate, unbalanced
+
+
+class InfluenceLines:
+    """
+    Values of unknowns (forces in beams and reactions) caused by unit load
+    applied to each joint in turn. x[i, j] is value of unknown i when unit
+    load directed along x axis acts at joint j, y[i, j] - the same for load
+    directed along y axis. Columns of loads that can't be balanced are NaN.
+    """
+    def __init__(self, names, joints, x, y):
+        self.names = names
+        self.joints = joints
+        self.x = x
+        self.y = y
+
+    def matrix(self, load=(0, -1)):
+        """Return unknowns × joints matrix for load vector (x, y)."""
+        return load[0] * self.x + load[1] * self.y
+
+    def envelope(self, load=(0, -1)):
+        """Return dict mapping unknown name to its (min, max) values."""
+        m = self.matrix(load)
+        if not self.joints:
+            return {}
+        return dict(zip(self.names, zip(numpy.nanmin(m, axis=1),
+                                        numpy.nanmax(m, axis=1))))
+
+    def critical_joints(self, load=(0, -1)):
+        """
+        Return dict mapping unknown name to ids of joints load at which
+        gives its min and max values.
+        """
+        m = self.matrix(load)
+        if not self.joints:
+            return {}
+        minimums = (self.joints[i] for i in numpy.nanargmin(m, axis=1))
+        maximums = (self.joints[i] for i in numpy.nanargmax(m, axis=1))
+        return dict(zip(self.names, zip(minimums, maximums)))
+
+
+def influence_lines(factorization, names, joints):
+    """
+    Solve for unit loads along x and y axes at every joint at once: right
+    hand side of joints equilibrium equations is diagonal matrix of constants
+    unit loads give (+1 in x rows and -1 in y rows, as constants does).
+    """
+    rows = factorization.shape[0]
+    signs = numpy.where(numpy.arange(rows) % 2, -1.0, 1.0)
+    x, balanced = factorization.least_squares(numpy.diag(signs))
+    x[:, ~balanced] = numpy.nan
+    return InfluenceLines(names, joints, x[:, 0::2], x[:, 1::2])
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uniform grid spatial index of truss joints (points) and beams (segments).
+
+Plane is divided into square cells, each cell keeps items that lie in it
+(point) or cross it (segment). Queries look only at cells near the query
+point or rectangle, so for evenly spread items they take time independent
+of number of items. Items are stored under keys given by caller together
+with their coordinates: x, y of point or x1, y1, x2, y2 of segment.
+"""
+from math import floor, hypot, inf
+
+
+class Grid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.__cells = {}  # (column, row) -> {key: item}
+        self.__where = {}  # key -> cells item is in
+        self.__coordinates = {}  # key -> coordinates of item
+        self.__extent = None  # min, max column and row that ever had items
+
+    def __len__(self):
+        return len(self.__where)
+
+    def add(self, key, item, coordinates):
+        """
+        Add item with coordinates x, y (point) or x1, y1, x2, y2 (segment),
+        replace item with the same key.
+        """
+        self.discard(key)
+        if len(coordinates) == 4:
+            cells = self.segment_cells(*coordinates)
+            ends = (self.cell_of(*coordinates[:2]),
+                    self.cell_of(*coordinates[2:]))
+        else:
+            cells = ends = (self.cell_of(*coordinates),)
+        for cell in cells:
+            items = self.__cells.get(cell)
+            if items is None:
+                items = self.__cells[cell] = {}
+            items[key] = item
+        self.__where[key] = cells
+        self.__coordinates[key] = tuple(coordinates)
+        for column, row in ends:  # other cells of segment are between
+            self.__extend(column, row)
+
+    def discard(self, key):
+        self.__coordinates.pop(key, None)
+        for cell in self.__where.pop(key, ()):
+            items = self.__cells[cell]
+            del items[key]
+            if not items:
+                del self.__cells[cell]
+
+    def cell_of(self, x, y):
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def segment_cells(self, x1, y1, x2, y2):
+        """Return cells crossed by segment, column by column."""
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        size = self.cell_size
+        first, last = floor(x1 / size), floor(x2 / size)
+        if first == last:  # e.g. vertical segment
+            rows = floor(y1 / size), floor(y2 / size)
+            return tuple((first, row)
+                         for row in range(min(rows), max(rows) + 1))
+        slope = (y2 - y1) / (x2 - x1)
+        cells = []
+        for column in range(first, last + 1):
+            start = max(x1, column * size)
+            end = min(x2, (column + 1) * size)
+            rows = (floor((y1 + (start - x1) * slope) / size),
+                    floor((y1 + (end - x1) * slope) / size))
+            cells.extend((column, row)
+                         for row in range(min(rows), max(rows) + 1))
+        return tuple(cells)
+
+    def nearest_point(self, x, y, max_distance=inf):
+        """
+        Return (key, item) of point nearest to x, y not farther than
+        max_distance or None. Of equally distant points one with the least
+        key is returned.
+        """
+        if not self.__cells:
+            return None
+        column, row = self.cell_of(x, y)
+        best, best_distance = None, max_distance
+        first, last = self.__rings_to_extent(column, row)
+        for ring in range(first, last + 1):
+            if ring and (ring - 1) * self.cell_size > best_distance:
+                break  # points in this and farther rings are farther
+            for cell in self.__ring(column, row, ring):
+                for key, item in self.__cells.get(cell, {}).items():
+                    point_x, point_y = self.__coordinates[key]
+                    distance = hypot(point_x - x, point_y - y)
+                    if distance < best_distance or \
+                            distance == best_distance and \
+                            (best is None or key < best[0]):
+                        best, best_distance = (key, item), distance
+        return best
+
+    def nearest_segment(self, x, y, max_distance):
+        """
+        Return (key, item) of segment nearest to x, y not farther than
+        max_distance or None (the least key of equally distant ones).
+        """
+        best, best_distance = None, max_distance
+        for key, item in sorted(self.__near(x - max_distance,
+                                            y - max_distance,
+                                            x + max_distance,
+                                            y + max_distance).items()):
+            distance = distance_to_segment(x, y, *self.__coordinates[key])
+            if distance < best_distance or \
+                    distance == best_distance and best is None:
+                best, best_distance = (key, item), distance
+        return best
+
+    def in_rect(self, left, bottom, right, top):
+        """Return {key: item} of items inside or crossing rectangle."""
+        found = {}
+        for key, item in self.__near(left, bottom, right, top).items():
+            coordinates = self.__coordinates[key]
+            if len(coordinates) == 4:
+                inside = segment_in_rect(*coordinates, left, bottom, right,
+                                         top)
+            else:
+                inside = left <= coordinates[0] <= right and \
+                    bottom <= coordinates[1] <= top
+            if inside:
+                found[key] = item
+        return found
+
+    def __near(self, left, bottom, right, top):
+        """Return {key: item} of items in cells overlapping rectangle."""
+        first_column, first_row = self.cell_of(left, bottom)
+        last_column, last_row = self.cell_of(right, top)
+        if self.__extent is None:
+            return {}
+        min_column, max_column, min_row, max_row = self.__extent
+        first_column, last_column = (max(first_column, min_column),
+                                     min(last_column, max_column))
+        first_row, last_row = max(first_row, min_row), min(last_row, max_row)
+        found = {}
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > \
+                len(self.__cells):  # cheaper to check all nonempty cells
+            for (column, row), items in self.__cells.items():
+                if first_column <= column <= last_column and \
+                        first_row <= row <= last_row:
+                    found.update(items)
+            return found
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                found.update(self.__cells.get((column, row), {}))
+        return found
+
+    def __extend(self, column, row):
+        extent = self.__extent
+        if extent is None:
+            self.__extent = [column, column, row, row]
+            return
+        if column < extent[0]:
+            extent[0] = column
+        elif column > extent[1]:
+            extent[1] = column
+        if row < extent[2]:
+            extent[2] = row
+        elif row > extent[3]:
+            extent[3] = row
+
+    def __rings_to_extent(self, column, row):
+        """Return the first and the last ring around cell crossing extent."""
+        min_column, max_column, min_row, max_row = self.__extent
+        first = max(min_column - column, column - max_column,
+                    min_row - row, row - max_row, 0)
+        last = max(column - min_column, max_column - column,
+                   row - min_row, max_row - row, 0)
+        return first, last
+
+    def __ring(self, column, row, ring):
+        """Return cells of ring around cell that are within extent."""
+        if not ring:
+            return ((column, row),)
+        min_column, max_column, min_row, max_row = self.__extent
+        columns = range(max(column - ring, min_column),
+                        min(column + ring, max_column) + 1)
+        rows = range(max(row - ring + 1, min_row),
+                     min(row + ring - 1, max_row) + 1)
+        cells = []
+        for r in (row - ring, row + ring):
+            if min_row <= r <= max_row:
+                cells.extend((c, r) for c in columns)
+        for c in (column - ring, column + ring):
+            if min_column <= c <= max_column:
+                cells.extend((c, r) for r in rows)
+        return cells
+
+
+def distance_to_segment(x, y, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length_squared = dx * dx + dy * dy
+    t = ((x - x1) * dx + (y - y1) * dy) / length_squared \
+        if length_squared else 0
+    t = min(1, max(0, t))
+    return hypot(x - x1 - t * dx, y - y1 - t * dy)
+
+
+def segment_in_rect(x1, y1, x2, y2, left, bottom, right, top):
+    """Check if segment crosses rectangle (Liang-Barsky clipping)."""
+    start, end = 0, 1
+    dx, dy = x2 - x1, y2 - y1
+    for p, q in ((-dx, x1 - left), (dx, right - x1),
+                 (-dy, y1 - bottom), (dy, top - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        elif p < 0:
+            start = max(start, q / p)
+        else:
+            end = min(end, q / p)
+        if start > end:
+            return False
+    return True
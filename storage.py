@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Truss file formats.
+
+JSON: array of items (the original format), JSON Lines: one item per line,
+binary: NumPy structured array (.npy) with one record per item that can be
+memory-mapped. Format is chosen by file extension when saving and detected
+by content when loading (empty file has no items in any format).
+"""
+import json
+import sys
+
+TYPES = ("PinJoint", "PinnedSupport", "RollerSupport", "Beam", "Force")
+VALUES = ("x", "y", "angle", "value")  # float fields of binary records
+REFERENCES = (("end1", "applied_to"), ("end2",))  # fields of ref1, ref2
+CHUNK = 4096  # items converted to binary records or back at once
+NUMPY_MAGIC = b"\x93NUMPY"
+EXTENSIONS = dict(json=".json", jsonl=".jsonl", binary=".npy")
+
+
+def format_of(filename):
+    """Return format of existing file (checked by content), None if empty."""
+    with open(filename, "rb") as f:
+        head = f.read(len(NUMPY_MAGIC))
+        if head == NUMPY_MAGIC:
+            return "binary"
+        first = head.lstrip()[:1]
+        while not first:  # skip leading whitespace
+            chunk = f.read(256)
+            if not chunk:
+                return None
+            first = chunk.lstrip()[:1]
+    return "jsonl" if first == b"{" else "json"
+
+
+def format_for(filename):
+    """Return format to save file with given name in (by extension)."""
+    for name, extension in EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return name
+    return "json"
+
+
+def load(filename):
+    """Return iterable of items stored in file of any supported format."""
+    file_format = format_of(filename)
+    if file_format is None:
+        return ()
+    return dict(json=load_json, jsonl=load_json_lines,
+                binary=load_binary)[file_format](filename)
+
+
+def save(items, filename):
+    """
+    Save items to file in format chosen by filename extension. JSON formats
+    store all fields of items, binary format stores fields of Truss
+    MANDATORY_FIELDS only (and items must be a sequence).
+    """
+    dict(json=save_json, jsonl=save_json_lines,
+         binary=save_binary)[format_for(filename)](items, filename)
+
+
+def load_json(filename):
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+def save_json(items, filename):
+    """Write items one per line, so no string of whole file is built."""
+    with open(filename, "w") as f:
+        f.write("[")
+        separator = "\n"
+        for item in items:
+            f.write(separator + json.dumps(item))
+            separator = ",\n"
+        f.write("\n]\n")
+
+
+def load_json_lines(filename):
+    with open(filename, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def save_json_lines(items, filename):
+    with open(filename, "w") as f:
+        for item in items:
+            f.write(json.dumps(item) + "\n")
+
+
+def open_binary(filename):
+    """Return memory-mapped records of binary file (see save_binary)."""
+    import numpy  # type: ignore # pylint: disable=C0415,import-error
+    return numpy.load(filename, mmap_mode="r", allow_pickle=False)
+
+
+def load_binary(filename):
+    return items_of(open_binary(filename))
+
+
+def items_of(records):
+    """
+    Return items of records of binary file. Records are converted in
+    chunks, so no lists of whole model are built.
+    """
+    beam, force = TYPES.index("Beam"), TYPES.index("Force")
+
+    def decoded(ids):
+        return [i.decode() for i in ids.tolist()]
+
+    for start in range(0, len(records), CHUNK):
+        chunk = records[start:start + CHUNK]
+        kind, ref1, ref2 = chunk["type"], chunk["ref1"], chunk["ref2"]
+        dangling = (kind >= beam) & (ref1 < 0) | (kind == beam) & (ref2 < 0)
+        if dangling.any():
+            item_id = chunk["id"][dangling][0].decode()
+            raise ValueError(f"{item_id} refers to inexistent item")
+        for kind, item_id, x, y, angle, value, end1, end2 in zip(
+                kind.tolist(), decoded(chunk["id"]), chunk["x"].tolist(),
+                chunk["y"].tolist(), chunk["angle"].tolist(),
+                chunk["value"].tolist(), decoded(records["id"][ref1]),
+                decoded(records["id"][ref2])):
+            if kind == beam:
+                yield dict(type="Beam", id=item_id, end1=end1, end2=end2)
+            elif kind == force:
+                yield dict(type="Force", id=item_id, applied_to=end1,
+                           angle=angle, value=value)
+            elif TYPES[kind] == "RollerSupport":
+                yield dict(type="RollerSupport", id=item_id, x=x, y=y,
+                           angle=angle)
+            else:
+                yield dict(type=TYPES[kind], id=item_id, x=x, y=y)
+
+
+def arrays_of(records):
+    """
+    Return arrays.TrussArrays of records of binary file without creating
+    items, or None if some beam or force doesn't refer to a joint (such
+    records must be loaded as items, so invalid ones are removed).
+    """
+    import numpy  # type: ignore # pylint: disable=C0415,import-error
+    from arrays import TrussArrays, ROLLER  # pylint: disable=C0415
+    kind = numpy.asarray(records["type"])
+    if len(kind) and (kind.min() < 0 or kind.max() >= len(TYPES)):
+        return None
+    joints = numpy.flatnonzero(kind < TYPES.index("Beam"))
+    beams = numpy.flatnonzero(kind == TYPES.index("Beam"))
+    forces = numpy.flatnonzero(kind == TYPES.index("Force"))
+    joint_of_row = numpy.full(len(records) + 1, -1, numpy.intp)
+    joint_of_row[joints] = numpy.arange(len(joints))  # row -1 maps to -1
+    beam_ends = numpy.stack((joint_of_row[records["ref1"][beams]],
+                             joint_of_row[records["ref2"][beams]]), axis=-1)
+    force_joint = joint_of_row[records["ref1"][forces]]
+    if (beam_ends < 0).any() or (force_joint < 0).any():
+        return None
+
+    def ids(rows):
+        return tuple(sys.intern(i.decode())
+                     for i in records["id"][rows].tolist())
+
+    joint_kind = kind[joints]
+    return TrussArrays.of_arrays(
+        joint_ids=ids(joints), kind=joint_kind,
+        xy=numpy.stack((records["x"][joints], records["y"][joints]),
+                       axis=-1),
+        angle=numpy.where(joint_kind == ROLLER, records["angle"][joints], 0),
+        beam_ids=ids(beams), beam_ends=beam_ends,
+        force_ids=ids(forces), force_joint=force_joint,
+        force_angle=records["angle"][forces],
+        force_value=records["value"][forces])
+
+
+def save_binary(items, filename):
+    """
+    Save items (sequence, it is read more than once) as NumPy structured
+    array: item type (index in TYPES), id (UTF-8), x, y, angle and value
+    (NaN if item has no such field) and rows of joints beam ends (ref1,
+    ref2) or force (ref1) refer to. References are resolved with sorted ids
+    and records are written to memory-mapped file chunk by chunk, so no
+    Python lists of whole model are built.
+    """
+    import numpy  # type: ignore # pylint: disable=C0415,import-error
+    width = max((len(i["id"].encode()) for i in items), default=1)
+    ids = numpy.fromiter((i["id"].encode() for i in items), f"S{width}",
+                         len(items))
+    refs = references_of(items, ids)
+    dtype = [("type", "i1"), ("id", f"S{width}"),
+             *((f, "f8") for f in VALUES), ("ref1", "i4"), ("ref2", "i4")]
+    if not items:  # empty file can't be memory-mapped
+        with open(filename, "wb") as f:
+            numpy.save(f, numpy.zeros(0, dtype), allow_pickle=False)
+        return
+    records = numpy.lib.format.open_memmap(filename, "w+", dtype,
+                                           (len(items),))
+    for start in range(0, len(items), CHUNK):
+        chunk = items[start:start + CHUNK]
+        rows = records[start:start + len(chunk)]
+        rows["type"] = [TYPES.index(i["type"]) for i in chunk]
+        rows["id"] = ids[start:start + len(chunk)]
+        for field in VALUES:
+            rows[field] = [i.get(field, numpy.nan) for i in chunk]
+        rows["ref1"], rows["ref2"] = refs[start:start + len(chunk)].T
+    records.flush()
+
+
+def references_of(items, ids):
+    """
+    Return rows of items (the first one with given id) beam ends and forces
+    refer to (-1 if none), raise ValueError if there is no such item.
+    """
+    import numpy  # type: ignore # pylint: disable=C0415,import-error
+    order = numpy.argsort(ids, kind="stable")
+    ordered = ids[order]
+    first = numpy.flatnonzero(numpy.concatenate(
+        ([True], ordered[1:] != ordered[:-1])))
+    unique, rows = ordered[first], order[first]
+    del order, ordered
+    refs = numpy.full((len(items), 2), -1, numpy.int32)
+    for start in range(0, len(items), CHUNK):
+        chunk = items[start:start + CHUNK]
+        for column, fields in enumerate(REFERENCES):
+            given = [(n, i[f].encode()) for n, i in enumerate(chunk)
+                     for f in fields if f in i]
+            if not given:
+                continue
+            indices, wanted = (numpy.array(c) for c in zip(*given))
+            position = numpy.searchsorted(unique, wanted)
+            position[position == len(unique)] = 0
+            missing = unique[position] != wanted
+            if missing.any():
+                item = chunk[indices[missing][0]]
+                raise ValueError(f"{item['id']} refers to inexistent item")
+            refs[start + indices, column] = rows[position]
+    return refs
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from io import StringIO
+from unittest import TestCase
+from unittest.mock import patch
+import json
+import os
+import tempfile
+import batch
+
+
+class TestBatch(TestCase):
+    def test_find_files(self):
+        files = batch.find_files(["examples", "README.md"])
+        self.assertIn(os.path.join("examples", "truss01.json"), files)
+        self.assertEqual("README.md", files[-1])
+
+    def test_output_and_cache_are_not_truss_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("truss.json", "cache.json", "results.jsonl"):
+                open(os.path.join(directory, name), "w").close()
+            exclude = [os.path.join(directory, name)
+                       for name in ("cache.json", "results.jsonl")]
+            files = batch.find_files([directory], exclude)
+        self.assertEqual([os.path.join(directory, "truss.json")], files)
+
+    def test_calculate_file(self):
+        result = batch.calculate_file("examples/truss01.json")
+        self.assertAlmostEqual(2.5769, result["results"]["B1"], places=4)
+        self.assertGreater(result["seconds"], 0)
+
+    def test_calculate_file_with_error(self):
+        result = batch.calculate_file("examples/truss02.json")
+        self.assertEqual("ValueError: truss is statically indeterminate",
+                         result["error"])
+
+    def test_calculate_malformed_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "truss.json")
+            with open(filename, "w") as f:
+                json.dump([1, 2], f)
+            result = batch.calculate_file(filename)
+        self.assertTrue(result["error"].startswith("AttributeError"))
+
+    def test_json_lines_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.jsonl")
+            with patch("sys.stderr", new=StringIO()) as stderr:
+                code = batch.main(["-j", "1", "-o", output,
+                                   "examples/truss01.json",
+                                   "examples/truss03.json"])
+            with open(output) as f:
+                results = [json.loads(line) for line in f]
+        self.assertEqual(1, code)
+        self.assertEqual(2, len(results))
+        self.assertIn("2 files (1 failed)", stderr.getvalue())
+
+    def test_cached_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.jsonl")
+            cache = os.path.join(directory, "cache.json")
+            argv = ["-j", "1", "-o", output, "-c", cache,
+                    "examples/truss01.json", "examples/truss02.json"]
+            runs = []
+            for _ in range(2):
+                with patch("sys.stderr", new=StringIO()):
+                    batch.main(argv)
+                with open(output) as f:
+                    runs.append(sorted((json.loads(line) for line in f),
+                                       key=lambda r: r["file"]))
+        self.assertFalse(any("cached" in r for r in runs[0]))
+        self.assertTrue(all(r["cached"] for r in runs[1]))
+        self.assertEqual(runs[0][0]["results"], runs[1][0]["results"])
+        self.assertEqual(runs[0][1]["error"], runs[1][1]["error"])
+
+    def test_csv_output(self):
+        out = StringIO()
+        writer = batch.CsvWriter(out)
+        writer.write(dict(file="t.json", seconds=1, results=dict(B1=2.0)))
+        self.assertEqual(["file,seconds,error,unknown,value",
+                          "t.json,1.000000,,B1,2.0"],
+                         out.getvalue().splitlines())
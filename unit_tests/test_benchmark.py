@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from io import StringIO
+from unittest import TestCase
+from unittest.mock import patch
+import json
+import os
+import tempfile
+import benchmark
+
+
+class TestBenchmark(TestCase):
+    def test_compare(self):
+        baseline = {"results": {
+            "a/items": {"seconds": 1.0, "peak_bytes": 10 ** 6},
+            "b/items": {"seconds": 1.0, "peak_bytes": 10 ** 6},
+            "c/refresh": {"skipped": "no display"},
+        }}
+        results = {"results": {
+            "a/items": {"seconds": 1.9, "peak_bytes": 2 * 10 ** 6},
+            "b/items": {"seconds": 2.1, "peak_bytes": 10 ** 6 + 10},
+            "c/refresh": {"seconds": 1.0, "peak_bytes": 0},
+        }}
+        regressions = benchmark.compare(results, baseline)
+        self.assertEqual([("a/items", "peak_bytes"), ("b/items", "seconds")],
+                         list(regressions))
+        self.assertEqual(["c/refresh"],
+                         benchmark.not_compared(results, baseline))
+        self.assertTrue(regressions["b/items", "seconds"].startswith(
+            "b/items seconds: 2.1 is 2.10 times baseline 1"))
+
+    def test_noise_is_not_regression(self):
+        baseline = {"results": {"a/items": {"seconds": 1e-4,
+                                            "peak_bytes": 100}}}
+        results = {"results": {"a/items": {"seconds": 1e-3,
+                                           "peak_bytes": 1000}}}
+        self.assertEqual({}, benchmark.compare(results, baseline))
+
+    def test_thresholds(self):
+        baseline = {"results": {"a/items": {"seconds": 1.0,
+                                            "peak_bytes": 10 ** 6}}}
+        results = {"results": {"a/items": {"seconds": 1.2,
+                                           "peak_bytes": 10 ** 6}}}
+        self.assertEqual(1, len(benchmark.compare(
+            results, baseline, dict(seconds=1.1, peak_bytes=1.1))))
+
+    @patch("benchmark.MIN_DURATION", new=0)
+    def test_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            baseline = os.path.join(directory, "baseline.json")
+            argv = ["-k", "warren-10/[ich]*", "-o", output, "-b", baseline]
+            with patch("sys.stderr", new=StringIO()):
+                self.assertEqual(0, benchmark.main(argv + ["-u"]))
+            with patch("sys.stderr", new=StringIO()) as stderr:
+                self.assertEqual(0, benchmark.main(argv))
+            with open(output) as f:
+                results = json.load(f)["results"]
+        self.assertEqual(["warren-10/calculate", "warren-10/history",
+                          "warren-10/items"], sorted(results))
+        self.assertIn("0 regressions", stderr.getvalue())
+
+    def test_missing_baseline_is_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            with patch("sys.stderr", new=StringIO()) as stderr:
+                self.assertEqual(2, benchmark.main(["-b", baseline]))
+        self.assertIn("no baseline", stderr.getvalue())
+
+    @patch("benchmark.MIN_DURATION", new=0)
+    def test_update_keeps_other_operations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            argv = ["-o", os.devnull, "-b", baseline, "-u"]
+            with patch("sys.stderr", new=StringIO()):
+                benchmark.main(argv + ["-k", "warren-10/items"])
+                benchmark.main(argv + ["-k", "warren-10/refresh"])
+            with open(baseline) as f:
+                results = json.load(f)["results"]
+        self.assertEqual(["warren-10/items", "warren-10/refresh"],
+                         sorted(results))
+        self.assertGreater(results["warren-10/refresh"]["seconds"], 0)
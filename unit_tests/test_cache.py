@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+import os
+import tempfile
+from cache import ResultCache
+
+
+class TestCache(TestCase):
+    def test_get(self):
+        cache = ResultCache()
+        cache.put("a", {"results": {"B1": 1.0}})
+        self.assertEqual({"results": {"B1": 1.0}}, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+    def test_least_recently_used_are_evicted(self):
+        cache = ResultCache(max_size=2)
+        cache.put("a", {"error": "a"})
+        cache.put("b", {"error": "b"})
+        cache.get("a")
+        cache.put("c", {"error": "c"})
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(2, len(cache))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "cache.json")
+            cache = ResultCache(filename=filename)
+            cache.put("a", {"results": {"B1": 1.0}})
+            cache.put("b", {"error": "b"})
+            cache.save()
+            loaded = ResultCache(max_size=1, filename=filename)
+        self.assertEqual(1, len(loaded))
+        self.assertEqual({"error": "b"}, loaded.get("b"))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest.mock import Mock
+from time import monotonic
+from calculation import Calculation
+from domain import Truss
+
+TIMEOUT = 10  # seconds
+
+
+class TestCalculation(TestCase):
+    def setUp(self):
+        self.truss = Truss()
+        self.truss.load_from("examples/truss07.json")
+        self.calculation = Calculation()
+        self.callback = Mock()
+        self.calculation.append_observer_callback(self.callback)
+
+    def wait(self):
+        start = monotonic()
+        while self.calculation.poll():
+            self.assertLess(monotonic() - start, TIMEOUT)
+        return [c.args[0] for c in self.callback.call_args_list]
+
+    def test_results(self):
+        self.calculation.start(self.truss.arrays)
+        messages = self.wait()
+        self.assertEqual(["assembling", "checking determinacy", "solving"],
+                         [m["stage"] for m in messages[:-1]])
+        self.assertEqual("calculation finished", messages[-1]["action"])
+        expected = self.truss.calculate()
+        self.assertEqual(expected.keys(), messages[-1]["results"].keys())
+        for name, value in expected.items():
+            self.assertAlmostEqual(value, messages[-1]["results"][name])
+
+    def test_error(self):
+        self.truss.load_from("examples/truss02.json")
+        self.calculation.start(self.truss.arrays)
+        message = self.wait()[-1]
+        self.assertEqual("calculation failed", message["action"])
+        self.assertIsInstance(message["error"], ValueError)
+
+    def test_superseded_run_is_discarded(self):
+        self.calculation.start(self.truss.arrays)
+        self.truss.load_from("examples/truss02.json")
+        self.calculation.start(self.truss.arrays)
+        finished = [m for m in self.wait() if "progress" not in m["action"]]
+        self.assertEqual(["calculation failed"],
+                         [m["action"] for m in finished])
+
+    def test_cancel(self):
+        self.calculation.start(self.truss.arrays)
+        self.calculation.cancel()
+        self.assertEqual([], self.wait())
+        self.assertFalse(self.calculation.running)
+
+    def test_factorization_is_reused(self):
+        self.calculation.start(self.truss.arrays)
+        self.wait()
+        force = next(i for i in self.truss.items if i["type"] == "Force")
+        self.truss.replace(force, {**force, "value": force["value"] * 2})
+        self.callback.reset_mock()
+        self.calculation.start(self.truss.arrays)
+        messages = self.wait()
+        self.assertEqual(["solving"], [m["stage"] for m in messages[:-1]])
+        for name, value in self.truss.calculate().items():
+            self.assertAlmostEqual(value, messages[-1]["results"][name])
+
+    def test_moved_joint(self):
+        self.calculation.start(self.truss.arrays)
+        self.wait()
+        joint = next(i for i in self.truss.items if i["type"] == "PinJoint")
+        self.truss.replace(joint, {**joint, "y": joint["y"] + 0.5})
+        self.callback.reset_mock()
+        self.calculation.start(self.truss.arrays)
+        results = self.wait()[-1]["results"]
+        for name, value in self.truss.calculate().items():
+            self.assertAlmostEqual(value, results[name])
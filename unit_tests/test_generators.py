@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from domain import Truss
+import generators
+
+
+class TestGenerators(TestCase):
+    def test_trusses_are_statically_determinate(self):
+        for generator in (generators.warren, generators.pratt,
+                          generators.howe, generators.k_truss):
+            for panels, spans in ((2, 1), (7, 1), (8, 3)):
+                with self.subTest(generator=generator.__name__,
+                                  panels=panels, spans=spans):
+                    self.assert_determinate(generator(panels, spans))
+        self.assert_determinate(generators.grid(5, 3))
+
+    def test_number_of_beams(self):
+        def beams(items):
+            return sum(i["type"] == "Beam" for i in items)
+        self.assertEqual(2 * (4 * 10 - 1), beams(generators.warren(10, 2)))
+        self.assertEqual(4 * 10 - 3, beams(generators.pratt(10)))
+        self.assertEqual(6 * 10 + 1, beams(generators.k_truss(10)))
+        self.assertEqual(2 * 3 * 4 + 2 * 3 + 2 * 4 - 1,
+                         beams(generators.grid(3, 4)))
+
+    def test_pratt_and_howe_diagonals(self):
+        for generator, compressed in ((generators.pratt, False),
+                                      (generators.howe, True)):
+            truss = Truss()
+            truss.items = generator(6)
+            results = truss.calculate()
+            diagonal = next(b for b in truss.find_by_type("Beam")
+                            if {b["end1"], b["end2"]} in
+                            ({"PJ6", "PJ2"}, {"PJ1", "PJ7"}))  # 2nd panel
+            self.assertEqual(compressed, results[diagonal["id"]] > 0)
+
+    def assert_determinate(self, items):
+        ids = [i["id"] for i in items]
+        self.assertEqual(len(ids), len(set(ids)))
+        truss = Truss()
+        truss.items = items
+        results = truss.calculate()
+        reactions = 2 * len(tuple(truss.find_by_type("PinnedSupport"))) + \
+            len(tuple(truss.find_by_type("RollerSupport")))
+        self.assertEqual(len(tuple(truss.find_by_type("Beam"))) + reactions,
+                         len(results))
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from unittest import TestCase
-from unittest.mock import Mock
-from domain import History
+from unittest.mock import Mock, call, patch
+from domain import History, Truss
+
+ADD_1 = dict(added=(1,), removed=(), modified=())
+ADD_2 = dict(added=(2,), removed=(), modified=())
+REMOVE_1 = dict(added=(), removed=(1,), modified=())
 
 
 class TestHistory(TestCase):
     def setUp(self):
-        self.history = History(None)
+        self.apply = Mock()
+        self.history = History(self.apply)
 
     def test_can_not_undo_empty_history(self):
         self.assertFalse(self.history.can_undo())
@@ -16,57 +21,130 @@ class TestHistory(TestCase):
         self.assertFalse(self.history.can_redo())
 
     def test_can_undo_history_with_one_state(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         self.assertTrue(self.history.can_undo())
 
     def test_can_not_redo_history_without_calling_undo(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         self.assertFalse(self.history.can_redo())
 
     def test_can_redo_history_after_calling_undo(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         self.history.undo()
         self.assertTrue(self.history.can_redo())
 
     def test_can_not_redo_history_after_undo_and_append(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         self.history.undo()
-        self.history.append(2)
+        self.history.append(ADD_2)
         self.assertFalse(self.history.can_redo())
 
     def test_can_not_undo_history_with_one_state_after_one_undo(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         self.assertTrue(self.history.can_undo())
         self.history.undo()
         self.assertFalse(self.history.can_undo())
 
+    def test_empty_change_is_ignored(self):
+        self.history.append(dict(added=(), removed=(), modified=()))
+        self.assertFalse(self.history.can_undo())
+
     def test_undo(self):
-        initial_state = 0
-        self.history = History(initial_state)
-        self.history.append(1)
-        self.assertEqual(self.history.undo(), initial_state)
+        self.history.append(ADD_1)
+        self.history.undo()
+        self.apply.assert_called_once_with(REMOVE_1)
+
+    def test_undo_modification(self):
+        self.history.append(dict(added=(), removed=(), modified=((1, 2),)))
+        self.history.undo()
+        self.apply.assert_called_once_with(
+            dict(added=(), removed=(), modified=((2, 1),)))
 
     def test_redo(self):
-        state = 1
-        self.history.append(state)
+        self.history.append(ADD_1)
+        self.history.undo()
+        self.history.redo()
+        self.assertEqual(call(ADD_1), self.apply.call_args)
+
+    def test_changes_made_while_undoing_are_not_recorded(self):
+        self.apply.side_effect = self.history.append
+        self.history.append(ADD_1)
+        self.history.undo()
+        self.assertFalse(self.history.can_undo())
+        self.assertTrue(self.history.can_redo())
+
+    def test_rapid_changes_are_undone_together(self):
+        self.history = History(self.apply, interval=10)
+        self.history.append(ADD_1)
+        self.history.append(ADD_2)
         self.history.undo()
-        self.assertEqual(self.history.redo(), state)
+        self.assertFalse(self.history.can_undo())
+        self.assertEqual([call(History.inverse(ADD_2)),
+                          call(History.inverse(ADD_1))],
+                         self.apply.call_args_list)
+
+    def test_slow_changes_are_undone_separately(self):
+        self.history = History(self.apply, interval=10)
+        with patch("domain.monotonic", side_effect=(0, 20)):
+            self.history.append(ADD_1)
+            self.history.append(ADD_2)
+        self.history.undo()
+        self.assertTrue(self.history.can_undo())
+
+    def test_max_depth(self):
+        self.history = History(self.apply, max_depth=2)
+        for _ in range(3):
+            self.history.append(ADD_1)
+        self.history.undo()
+        self.history.undo()
+        self.assertFalse(self.history.can_undo())
+
+    def test_max_items(self):
+        self.history = History(self.apply, max_items=3)
+        self.history.append(dict(added=(1, 2), removed=(), modified=()))
+        self.history.append(ADD_1)
+        self.history.append(ADD_2)
+        self.history.undo()
+        self.history.undo()
+        self.assertFalse(self.history.can_undo())
+
+    def test_undo_and_redo_truss_changes(self):
+        truss = Truss()
+        history = History(truss.apply_change)
+        truss.append_observer_callback(history.append)
+        ps = dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0)
+        pj = dict(type="PinJoint", id="PJ1", x=1.0, y=0.0)
+        beam = dict(type="Beam", id="B1", end1="PS1", end2="PJ1")
+        for item in (ps, pj, beam):
+            truss.append(item)
+        truss.replace(pj, {**pj, "y": 1.0})
+        truss.remove(ps)  # beam is removed as well
+        self.assertEqual(({**pj, "y": 1.0},), truss.items)
+        history.undo()
+        self.assertEqual({pj["id"], ps["id"], beam["id"]},
+                         {i["id"] for i in truss})
+        self.assertEqual(1.0, truss.coordinates(truss.find_by_id("B1"))[3])
+        history.undo()
+        self.assertEqual(0.0, truss.coordinates(truss.find_by_id("B1"))[3])
+        history.redo()
+        history.redo()
+        self.assertEqual(({**pj, "y": 1.0},), truss.items)
 
     def test_notify_on_append(self):
         callback = Mock()
         self.history.append_observer_callback(callback)
-        self.history.append(1)
+        self.history.append(ADD_1)
         callback.assert_called_with(dict(action="history changed"))
 
     def test_notify_on_undo(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         callback = Mock()
         self.history.append_observer_callback(callback)
         self.history.undo()
         callback.assert_called_with(dict(action="history changed"))
 
     def test_notify_on_redo(self):
-        self.history.append(1)
+        self.history.append(ADD_1)
         self.history.undo()
         callback = Mock()
         self.history.append_observer_callback(callback)
@@ -76,5 +154,5 @@ class TestHistory(TestCase):
     def test_notify_on_reset(self):
         callback = Mock()
         self.history.append_observer_callback(callback)
-        self.history.reset("test")
+        self.history.reset()
         callback.assert_called_with(dict(action="history changed"))
@@ -64,6 +64,30 @@ class TestItemEditState(TestCase):
                                                  x=13, y=33, item=end2)),
                          dict(action="finish editing", item=item))
 
+    def test_beam_end_snaps_to_joint_near_cursor(self):
+        self.state.new("Beam")
+        j = dict(type="PinJoint", id="PJ1", x=1.0, y=2.0)
+        item = dict(type="Beam", x1=1.0, y1=2.0, x2=1.1, y2=2.1)
+        self.assertEqual(self.state.process(dict(action="move", x=1.1,
+                                                 y=2.1, item=j)),
+                         dict(action="update tmp", item=item))
+
+    def test_placing_node(self):
+        self.assertFalse(self.state.placing_node)
+        self.state.new("PinJoint")
+        self.assertFalse(self.state.placing_node)
+        self.state.new("Beam")
+        self.assertTrue(self.state.placing_node)
+        for joint_id in ("PS1", "PS2"):
+            self.assertTrue(self.state.placing_node)
+            j = dict(type="PinnedSupport", id=joint_id, x=0.0, y=0.0)
+            self.state.process(dict(action="item click", x=0, y=0, item=j))
+        self.assertFalse(self.state.placing_node)
+        self.state.new("Force")
+        self.assertTrue(self.state.placing_node)
+        self.state.process(dict(action="item click", x=0, y=0, item=j))
+        self.assertFalse(self.state.placing_node)  # angle is chosen now
+
     def test_new_force(self):
         self.state.new("Force")
 
@@ -109,4 +133,4 @@ class TestItemEditState(TestCase):
                          dict(action="delete", item=None))
 
         self.assertEqual(self.state.process(dict(action="click", x=0, y=0)),
-                         dict(action="cancel"))
+                         dict(action="deselect"))
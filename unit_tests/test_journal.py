@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+from domain import Truss
+from journal import Journal
+
+PS = dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0)
+PJ = dict(type="PinJoint", id="PJ1", x=1.0, y=0.0)
+BEAM = dict(type="Beam", id="B1", end1="PS1", end2="PJ1")
+
+
+class TestJournal(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "truss.json")
+        self.truss = Truss()
+        self.journal = self.__open(self.truss)
+        self.journal.save_as(self.filename)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def __open(self, truss):
+        journal = Journal(truss, self.filename)
+        truss.append_observer_callback(journal.record)
+        return journal
+
+    def __reopen(self, unsaved=True):
+        truss = Truss()
+        journal = Journal(truss, self.filename)
+        recovered = journal.load(unsaved)
+        journal.close()
+        return truss, recovered
+
+    def test_unsaved_changes_are_recovered(self):
+        for item in (PS, PJ, BEAM):
+            self.truss.append(dict(item))
+        self.truss.replace(self.truss.find_by_id("PJ1"), {**PJ, "y": 2.0})
+        truss, recovered = self.__reopen()
+        self.assertEqual(4, recovered)
+        self.assertEqual(self.truss.items, truss.items)
+        truss, recovered = self.__reopen(unsaved=False)
+        self.assertEqual((0, ()), (recovered, truss.items))
+
+    def test_save_writes_only_checkpoint(self):
+        self.truss.append(dict(PS))
+        stat = os.stat(self.filename)
+        self.journal.save()
+        self.assertEqual(stat, os.stat(self.filename))
+        self.truss.append(dict(PJ))
+        truss, recovered = self.__reopen(unsaved=False)
+        self.assertEqual((0, (PS,)), (recovered, truss.items))
+
+    def test_journal_is_compacted(self):
+        with patch("journal.COMPACT_AFTER", 2):
+            for item in (PS, PJ, BEAM):
+                self.truss.append(dict(item))
+            self.truss.remove(BEAM)  # journal is bigger than truss now
+            self.journal.save()
+        self.assertFalse(os.path.exists(self.journal.path))
+        truss, _ = self.__reopen()
+        self.assertEqual(self.truss.items, truss.items)
+
+    def test_journal_of_other_base_is_set_aside(self):
+        self.truss.append(dict(PS))
+        self.journal.close()
+        other = Truss()
+        other.append(dict(PJ))
+        other.save_as(self.filename)
+        truss, recovered = self.__reopen()
+        self.assertEqual((0, (PJ,)), (recovered, truss.items))
+        with open(self.journal.path) as f:
+            orphaned = f.read()
+        journal = self.__open(truss)
+        journal.load()
+        self.assertEqual(1, journal.orphaned)
+        truss.append(dict(PS))
+        journal.close()
+        with open(self.journal.path + ".orphaned") as f:
+            self.assertEqual(orphaned, f.read())
+        truss, recovered = self.__reopen()
+        self.assertEqual((1, (PJ, PS)), (recovered, truss.items))
+
+    def test_journal_survives_copy_of_base(self):
+        self.truss.append(dict(PS))
+        self.journal.save()
+        self.truss.append(dict(PJ))
+        self.journal.save()
+        os.utime(self.filename, ns=(0, 0))  # as if copied without times
+        truss, recovered = self.__reopen(unsaved=False)
+        self.assertEqual((0, (PS, PJ)), (recovered, truss.items))
+
+    def test_journal_is_compacted_without_save(self):
+        with patch("journal.COMPACT_AFTER", 4):
+            for item in (PS, PJ, BEAM):
+                self.truss.append(dict(item))
+            self.journal.save()
+            for y in range(10):
+                pj = self.truss.find_by_id("PJ1")
+                self.truss.replace(pj, {**PJ, "y": float(y)})
+        with open(self.journal.path) as f:
+            self.assertLess(len(f.readlines()), 10)
+        truss, _ = self.__reopen()
+        self.assertEqual(self.truss.items, truss.items)
+        truss, _ = self.__reopen(unsaved=False)
+        self.assertEqual((PS, PJ, BEAM), truss.items)
+
+    def test_incomplete_last_line_is_ignored(self):
+        self.truss.append(dict(PS))
+        self.journal.close()
+        with open(self.journal.path, "a") as f:
+            f.write('{"added": [')
+        truss = Truss()
+        journal = self.__open(truss)
+        self.assertEqual(1, journal.load())
+        truss.append(dict(PJ))
+        journal.close()
+        truss, recovered = self.__reopen()
+        self.assertEqual((2, (PS, PJ)), (recovered, truss.items))
+
+    def test_damaged_journal_of_never_saved_truss_is_discarded(self):
+        os.remove(self.filename)
+        for content in ("", '{"base": nu'):
+            with open(self.journal.path, "w") as f:
+                f.write(content)
+            truss, recovered = self.__reopen()
+            self.assertEqual((0, ()), (recovered, truss.items))
+            self.assertFalse(os.path.exists(self.journal.path))
+        with self.assertRaises(FileNotFoundError):  # no base, no journal
+            self.__reopen()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, call
 from misc import Observable
 
 
@@ -15,3 +15,18 @@ class TestObservable(TestCase):
         observable.notify(message)
 
         callback.assert_called_with(message)
+
+    def test_hold_notifications(self):
+        observable = Observable()
+        callback = Mock()
+        observable.append_observer_callback(callback)
+
+        with observable.hold_notifications():
+            observable.notify("first")
+            with observable.hold_notifications():
+                observable.notify("second")
+                observable.notify("first")
+            callback.assert_not_called()
+
+        self.assertEqual([call("first"), call("second")],
+                         callback.call_args_list)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase, skipUnless
+import numpy
+from numpy.testing import assert_almost_equal
+import solver
+
+# two equations with two unknowns: x0 + x1 = 3, x0 - x1 = 1
+A = ((0, 0, 1), (0, 1, 1), (1, 0, 1), (1, 1, -1))
+B = (3, 1)
+
+
+class TestSolver(TestCase):
+    def test_solve_dense(self):
+        assert_almost_equal(solver.solve((2, 2), A, B, sparse=False), (2, 1))
+
+    @skipUnless(solver.sparse_available(), "SciPy is not installed")
+    def test_solve_sparse(self):
+        assert_almost_equal(solver.solve((2, 2), A, B, sparse=True), (2, 1))
+
+    def test_solve_overdetermined(self):
+        a = A + ((2, 0, 2),)
+        for sparse in self.__modes():
+            assert_almost_equal(solver.solve((3, 2), a, B + (4,), sparse),
+                                (2, 1))
+
+    def test_factorization_solves_several_constants_vectors(self):
+        for sparse in self.__modes():
+            factorization = solver.factorize((2, 2), A, sparse)
+            assert_almost_equal(factorization.solve(B), (2, 1))
+            assert_almost_equal(factorization.solve((1, 1)), (1, 0))
+
+    def test_solve_several_constants_vectors_at_once(self):
+        for sparse in self.__modes():
+            assert_almost_equal(solver.solve((2, 2), A, ((3, 1), (1, 1)),
+                                             sparse), ((2, 1), (1, 0)))
+
+    def test_update(self):
+        a = ((0, 0, 1), (0, 1, 2), (1, 0, 1), (1, 1, -1))
+        for sparse in self.__modes():
+            factorization = solver.factorize((2, 2), A, sparse)
+            updated = solver.update(factorization, (2, 2), a)
+            self.assertIsInstance(updated, solver.UpdatedFactorization)
+            assert_almost_equal(updated.solve((4, 1)), (2, 1))
+
+    def test_update_to_singular_matrix_raises_exception(self):
+        a = ((0, 0, 1), (0, 1, 1), (1, 0, 1), (1, 1, 1))
+        for sparse in self.__modes():
+            factorization = solver.factorize((2, 2), A, sparse)
+            with self.assertRaises(ValueError):
+                solver.update(factorization, (2, 2), a)
+
+    def test_solve_stack(self):
+        a = numpy.array((((1, 1), (1, -1)), ((1, 1), (1, 1))), dtype=float)
+        x, indeterminate, unbalanced = solver.solve_stack(a, ((3, 1), (1, 1)))
+        assert_almost_equal(x[0], (2, 1))
+        self.assertEqual([False, True], list(indeterminate))
+        self.assertEqual([False, False], list(unbalanced))
+
+    def test_solve_without_unknowns(self):
+        self.assertEqual(len(solver.solve((2, 0), (), (0, 0))), 0)
+
+    def test_indeterminate_system_raises_exception(self):
+        a = ((0, 0, 1), (0, 1, 1), (1, 0, 1), (1, 1, 1))
+        for sparse in self.__modes():
+            with self.assertRaises(ValueError) as c:
+                solver.solve((2, 2), a, (1, 1), sparse)
+            self.assertEqual("truss is statically indeterminate",
+                             str(c.exception))
+
+    def test_inconsistent_system_raises_exception(self):
+        a = A + ((2, 0, 2),)
+        for sparse in self.__modes():
+            with self.assertRaises(ValueError) as c:
+                solver.solve((3, 2), a, B + (5,), sparse)
+            self.assertEqual("unbalanced truss", str(c.exception))
+
+    def test_solution_with_rounding_errors_is_balanced(self):
+        # x[i] - 2·x[i + 1] = 1, x grows beyond precision of its last digits
+        n = 100
+        a = [(i, i, 1) for i in range(n)] + \
+            [(i, i + 1, -2) for i in range(n - 1)]
+        if solver.sparse_available():  # dense SVD finds it ill-conditioned
+            x = solver.solve((n, n), a, [1] * n, sparse=True)
+            self.assertAlmostEqual(1, x[0] / 2 ** n, places=6)
+
+    @staticmethod
+    def __modes():
+        return (False, True) if solver.sparse_available() else (False,)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from spatial import Grid, distance_to_segment, segment_in_rect
+
+
+class TestSpatial(TestCase):
+    def setUp(self):
+        self.grid = Grid(1.0)
+        self.points = [dict(x=x, y=y) for x, y in ((0, 0), (2.5, 0), (7, 3))]
+        for key, point in enumerate(self.points):
+            self.grid.add(key, point, (point["x"], point["y"]))
+        self.segments = Grid(1.0)
+        self.segment = dict(x1=0.5, y1=0.5, x2=4.5, y2=2.5)
+        self.segments.add(10, self.segment, (0.5, 0.5, 4.5, 2.5))
+
+    def test_nearest_point(self):
+        self.assertEqual((1, self.points[1]),
+                         self.grid.nearest_point(2, 1))
+        self.assertEqual((2, self.points[2]),
+                         self.grid.nearest_point(100, -50))
+        self.assertIsNone(self.grid.nearest_point(5, 0, max_distance=1))
+
+    def test_nearest_of_equally_distant_points_has_least_key(self):
+        self.grid.add(3, dict(x=2.5, y=0), (2.5, 0))
+        self.assertEqual(1, self.grid.nearest_point(2.5, 0)[0])
+
+    def test_discard(self):
+        self.grid.discard(1)
+        self.assertEqual(0, self.grid.nearest_point(2, 1)[0])
+        self.assertEqual(2, len(self.grid))
+
+    def test_add_replaces_item_with_same_key(self):
+        self.grid.add(1, dict(x=10, y=10), (10, 10))
+        self.assertIsNone(self.grid.nearest_point(2.5, 0, max_distance=1))
+        self.assertEqual(3, len(self.grid))
+
+    def test_nearest_segment(self):
+        self.assertEqual((10, self.segment),
+                         self.segments.nearest_segment(2.5, 1.6, 0.2))
+        self.assertIsNone(self.segments.nearest_segment(2.5, 3, 0.2))
+
+    def test_in_rect(self):
+        self.assertEqual({1: self.points[1]}, self.grid.in_rect(2, -1, 3, 1))
+        self.assertEqual({10: self.segment},
+                         self.segments.in_rect(2, -1, 3, 1.5))
+        self.assertEqual({}, self.segments.in_rect(5, -1, 6, 1))
+
+    def test_segment_cells(self):
+        self.assertEqual(((0, 0), (1, 0), (1, 1)),
+                         self.grid.segment_cells(0.5, 0.5, 1.9, 1.2))
+        self.assertEqual(((2, -1), (2, 0), (2, 1)),
+                         self.grid.segment_cells(2.5, 1.5, 2.5, -0.5))
+
+    def test_distance_to_segment(self):
+        self.assertEqual(1, distance_to_segment(1, 1, 0, 0, 2, 0))
+        self.assertEqual(5, distance_to_segment(5, 4, 0, 0, 2, 0))
+        self.assertEqual(5, distance_to_segment(3, 4, 0, 0, 0, 0))
+
+    def test_segment_in_rect(self):
+        self.assertTrue(segment_in_rect(-1, -1, 3, 3, 0, 0, 1, 1))
+        self.assertFalse(segment_in_rect(-1, 0, 0, 3, 0, 0, 1, 1))
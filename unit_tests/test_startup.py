@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+import os
+import subprocess
+import sys
+
+DOMAIN_IMPORT_BUDGET = 0.1  # seconds
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEASURE_IMPORT = """
+from time import perf_counter
+import sys
+start = perf_counter()
+import domain
+print(perf_counter() - start, "numpy" in sys.modules, "tkinter" in sys.modules)
+"""
+IMPORT_GUI = """
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+import sys
+loader = SourceFileLoader("run", "run.pyw")
+run = module_from_spec(spec_from_loader("run", loader))
+loader.exec_module(run)
+print(run.root is None, "numpy" in sys.modules)
+"""
+
+
+class TestStartup(TestCase):
+    def test_domain_import_time(self):
+        best = min(self.__run(MEASURE_IMPORT)[0] for _ in range(3))
+        self.assertLess(float(best), DOMAIN_IMPORT_BUDGET)
+
+    def test_domain_import_does_not_load_numpy_and_tk(self):
+        _, numpy, tkinter = self.__run(MEASURE_IMPORT)
+        self.assertEqual(("False", "False"), (numpy, tkinter))
+
+    def test_gui_is_created_in_main(self):
+        root_is_none, numpy = self.__run(IMPORT_GUI)
+        self.assertEqual(("True", "False"), (root_is_none, numpy))
+
+    @staticmethod
+    def __run(code):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                                check=True, capture_output=True, text=True)
+        return output.stdout.split()
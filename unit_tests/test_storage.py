@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+from domain import Truss
+import storage
+
+
+class TestStorage(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.truss = Truss()
+        self.truss.load_from("examples/truss07.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_save_and_load_all_formats(self):
+        for name, fmt in (("t.json", "json"), ("t.jsonl", "jsonl"),
+                          ("t.npy", "binary")):
+            self.truss.save_as(self.path(name))
+            self.assertEqual(fmt, storage.format_of(self.path(name)))
+            loaded = Truss()
+            loaded.load_from(self.path(name))
+            self.assertEqual(self.truss.items, loaded.items)
+
+    def test_format_is_detected_by_content(self):
+        self.truss.save_as(self.path("t.jsonl"))
+        os.rename(self.path("t.jsonl"), self.path("t.dat"))
+        loaded = Truss()
+        loaded.load_from(self.path("t.dat"))
+        self.assertEqual(self.truss.items, loaded.items)
+
+    def test_original_json_is_readable(self):
+        self.assertEqual("json", storage.format_of("examples/truss07.json"))
+        self.assertEqual("PJ2", self.truss.items[0]["id"])
+
+    def test_binary_file_is_memory_mapped(self):
+        self.truss.save_as(self.path("t.npy"))
+        records = storage.open_binary(self.path("t.npy"))
+        self.assertEqual(len(self.truss.items), len(records))
+        self.assertEqual(b"PJ2", records["id"][0])
+        self.assertEqual("r", records.mode)
+        del records  # unmap before directory is removed
+
+    def test_failed_load_keeps_truss(self):
+        with open(self.path("bad.jsonl"), "w") as f:
+            f.write('{"type": "PinJoint", "id": "PJ1", "x": 0, "y": 0}\n{')
+        with self.assertRaises(ValueError):
+            self.truss.load_from(self.path("bad.jsonl"))
+        self.assertEqual("PJ2", self.truss.items[0]["id"])
+
+    def test_empty_file_has_no_items(self):
+        for name, content in (("t.jsonl", ""), ("t.json", " \n")):
+            with open(self.path(name), "w") as f:
+                f.write(content)
+            self.assertIsNone(storage.format_of(self.path(name)))
+            self.truss.load_from(self.path(name))
+            self.assertEqual((), self.truss.items)
+
+    def test_binary_file_is_calculated_without_items(self):
+        self.truss.save_as(self.path("t.npy"))
+        loaded = Truss()
+        loaded.load_from(self.path("t.npy"))
+        arrays = loaded.arrays
+        self.assertEqual(self.truss.calculate(), loaded.calculate())
+        expected = self.truss.arrays
+        for name in ("joint_ids", "beam_ids", "force_ids", "joint_index"):
+            self.assertEqual(getattr(expected, name), getattr(arrays, name))
+        for name in ("kind", "xy", "angle", "beam_ends", "force_joint",
+                     "force_angle", "force_value"):
+            self.assertEqual(getattr(expected, name).tolist(),
+                             getattr(arrays, name).tolist())
+            self.assertFalse(getattr(arrays, name).flags.writeable)
+        self.assertEqual(self.truss.items, loaded.items)  # created now
+        self.assertIs(arrays, loaded.arrays)
+
+    def test_observers_are_told_about_items_of_binary_file(self):
+        self.truss.save_as(self.path("t.npy"))
+        loaded = Truss()
+        messages = []
+        loaded.append_observer_callback(messages.append)
+        loaded.load_from(self.path("t.npy"))
+        self.assertEqual(self.truss.items, messages[-1]["added"])
+
+    def test_binary_references_may_point_forward(self):
+        items = [dict(type="Beam", id="B1", end1="PS1", end2="PJ1"),
+                 dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0),
+                 dict(type="PinJoint", id="PJ1", x=1.0, y=0.0)]
+        storage.save(items, self.path("t.npy"))
+        self.assertEqual(items, list(storage.load(self.path("t.npy"))))
+        with self.assertRaises(ValueError):
+            storage.save(items[:2], self.path("t.npy"))
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, call, patch
 from domain import Truss
+import solver
 
 
 class TestTruss(TestCase):
@@ -90,8 +91,7 @@ class TestTruss(TestCase):
                  "angle": 180.0, "value": 2.0}
         self.truss.append(pj)
         self.truss.append(force)
-        self.assertEqual(self.truss.find_by_id("F1")["x"], pj["x"])
-        self.assertEqual(self.truss.find_by_id("F1")["y"], pj["y"])
+        self.assertEqual((pj["x"], pj["y"]), self.truss.coordinates(force))
 
     def test_beam_pos(self):
         pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5.0}
@@ -100,10 +100,21 @@ class TestTruss(TestCase):
         self.truss.append(ps)
         self.truss.append(pj)
         self.truss.append(beam)
-        self.assertEqual(self.truss.find_by_id("B1")["x1"], pj["x"])
-        self.assertEqual(self.truss.find_by_id("B1")["y1"], pj["y"])
-        self.assertEqual(self.truss.find_by_id("B1")["x2"], ps["x"])
-        self.assertEqual(self.truss.find_by_id("B1")["y2"], ps["y"])
+        self.assertEqual((pj["x"], pj["y"], ps["x"], ps["y"]),
+                         self.truss.coordinates(beam))
+        # coordinates of item being edited are preferred
+        self.assertEqual((1.0, 2.0, ps["x"], ps["y"]),
+                         self.truss.coordinates({**beam, "x1": 1.0,
+                                                 "y1": 2.0}))
+
+    def test_coordinates_of_items_are_not_stored(self):
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5.0}
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": 180.0, "value": 2.0, "x": 3.0, "y": 5.0}
+        self.truss.append(pj)
+        self.truss.append(force)
+        self.assertEqual({"type", "id", "applied_to", "angle", "value"},
+                         set(self.truss.find_by_id("F1")))
 
     def test_remove_item(self):
         pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
@@ -119,6 +130,58 @@ class TestTruss(TestCase):
         self.assertIn(new, self.truss)
         self.assertNotIn(old, self.truss)
 
+    def test_replace_keeps_item_position(self):
+        pj1 = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
+        pj2 = {"type": "PinJoint", "id": "PJ2", "x": 0.0, "y": 5}
+        new = {"type": "PinJoint", "id": "PJ1", "x": 0.0, "y": 0.0}
+        self.truss.append(pj1)
+        self.truss.append(pj2)
+        self.truss.replace(pj1, new)
+        self.assertEqual((new, pj2), self.truss.items)
+
+    def test_remove_joint_removes_linked_items(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 0.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PJ1", "end2": "PS1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": 180.0, "value": 2.0}
+        for i in (ps, pj, beam, force):
+            self.truss.append(i)
+        callback = Mock()
+        self.truss.append_observer_callback(callback)
+        self.truss.remove(pj)
+        self.assertEqual((ps,), self.truss.items)
+        callback.assert_any_call(dict(action="invalid items removed",
+                                      items=(beam, force)))
+        self.assertEqual((), self.truss.linked_beams(ps))
+
+    def test_replace_joint_updates_linked_items(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 0.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PJ1", "end2": "PS1"}
+        for i in (ps, pj, beam):
+            self.truss.append(i)
+        self.truss.replace(pj, {**pj, "x": 5.0, "y": 7.0})
+        self.assertEqual((5.0, 7.0), self.truss.coordinates(beam)[:2])
+        self.assertEqual((5.0, 7.0), (self.truss.right, self.truss.top))
+        self.truss.replace(self.truss.find_by_id("PJ1"), {**pj, "id": "PJ2"})
+        self.assertNotIn(beam, self.truss)
+
+    def test_dimensions_after_remove(self):
+        pj1 = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
+        pj2 = {"type": "PinJoint", "id": "PJ2", "x": 1.0, "y": 2}
+        pj3 = {"type": "PinJoint", "id": "PJ3", "x": 2.0, "y": 3}
+        for i in (pj1, pj2, pj3):
+            self.truss.append(i)
+        self.truss.remove(pj1)
+        self.assertEqual(2, self.truss.joints_count)
+        self.assertEqual(2, self.truss.items_count)
+        self.assertEqual((1, 2), (self.truss.left, self.truss.right))
+        self.assertEqual((2, 3), (self.truss.bottom, self.truss.top))
+        self.truss.remove(pj2)
+        self.truss.remove(pj3)
+        self.assertEqual((0, 0), (self.truss.width, self.truss.height))
+
     def test_create_new_truss(self):
         pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
         self.truss.append(pj)
@@ -130,6 +193,65 @@ class TestTruss(TestCase):
         self.truss.append(pj)
         self.assertEqual(pj, self.truss.find_by_id(pj["id"]))
 
+    def test_find_all_by_id(self):
+        pj1 = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
+        pj2 = {"type": "PinJoint", "id": "PJ1", "x": 0.0, "y": 0}
+        self.truss.append(pj1)
+        self.truss.append(pj2)
+        self.assertEqual((pj1, pj2), self.truss.find_all_by_id("PJ1"))
+        self.assertEqual((), self.truss.find_all_by_id("PJ2"))
+
+    def test_nearest_joint(self):
+        self.truss.load_from("examples/truss07.json")
+        self.assertEqual("PJ7", self.truss.nearest_joint(6.8, 1.1)["id"])
+        self.assertIsNone(self.truss.nearest_joint(6.8, 1.1, 0.1))
+        self.truss.remove(self.truss.find_by_id("PJ7"))
+        self.assertNotEqual("PJ7", self.truss.nearest_joint(6.8, 1.1)["id"])
+
+    def test_hit_beam(self):
+        self.truss.load_from("examples/truss07.json")
+        beam = self.truss.hit_beam(4, 0.05, 0.1)
+        self.assertEqual("B5", beam["id"])
+        self.assertIsNone(self.truss.hit_beam(4, 0.6, 0.1))
+
+    def test_items_in_rect_follow_modifications(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 4.0, "y": 0.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PS1", "end2": "PJ1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": 90, "value": 1}
+        for i in (ps, pj, beam, force):
+            self.truss.append(i)
+        self.assertEqual((pj, beam, force),
+                         self.truss.items_in_rect(3, -1, 5, 1))
+        moved = {**pj, "y": 3.0}
+        self.truss.replace(pj, moved)
+        self.assertEqual((), self.truss.items_in_rect(3, -1, 5, 1))
+        self.assertEqual((moved, beam, force),
+                         self.truss.items_in_rect(3, 1, 5, 4))
+
+    def test_content_hash_ignores_order(self):
+        self.truss.load_from("examples/truss07.json")
+        other = Truss()
+        other.items = tuple(reversed(self.truss.items))
+        self.assertEqual(self.truss.content_hash(), other.content_hash())
+
+    def test_content_hash_follows_modifications(self):
+        self.truss.load_from("examples/truss07.json")
+        original = self.truss.content_hash()
+        pj = self.truss.find_by_id("PJ7")
+        moved = {**pj, "x": pj["x"] + 1}
+        self.truss.replace(pj, moved)
+        self.assertNotEqual(original, self.truss.content_hash())
+        self.truss.replace(moved, pj)
+        self.assertEqual(original, self.truss.content_hash())
+
+    def test_content_hash_treats_int_as_float(self):
+        self.truss.append({"type": "PinJoint", "id": "PJ1", "x": 3, "y": 5})
+        other = Truss()
+        other.append({"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5.0})
+        self.assertEqual(self.truss.content_hash(), other.content_hash())
+
     def test_find_by_type(self):
         pj = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
         ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0}
@@ -146,6 +268,23 @@ class TestTruss(TestCase):
         self.truss.append(pj)
         self.assertEqual(self.truss.get_new_id_for("PinJoint"), "PJ11")
 
+    def test_get_new_id_after_remove(self):
+        pj1 = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
+        pj2 = {"type": "PinJoint", "id": "PJ2", "x": 0.0, "y": 5}
+        self.truss.append(pj1)
+        self.truss.append(pj2)
+        self.truss.remove(pj2)
+        self.assertEqual(self.truss.get_new_id_for("PinJoint"), "PJ2")
+        self.assertEqual(self.truss.get_new_id_for("Beam"), "B1")
+
+    def test_find_by_id_after_replace(self):
+        old = {"type": "PinJoint", "id": "PJ1", "x": 3.0, "y": 5}
+        new = {"type": "PinJoint", "id": "PJ1", "x": 0.0, "y": 0.0}
+        self.truss.append(old)
+        self.truss.replace(old, new)
+        self.assertIs(new, self.truss.find_by_id("PJ1"))
+        self.assertIsNone(self.truss.find_by_id("PJ2"))
+
     def test_pin_joint_is_in_joints(self):
         pj = {"type": "PinJoint", "id": "PJ10", "x": 3.0, "y": 5}
         self.truss.append(pj)
@@ -196,6 +335,16 @@ class TestTruss(TestCase):
         self.assertIn(beam2, self.truss.linked_beams(pj))
         self.assertNotIn(beam3, self.truss.linked_beams(pj))
 
+    def test_linked_beams_after_remove(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 25.0, "y": 100.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PJ1", "end2": "PS1"}
+        for i in (ps, pj, beam):
+            self.truss.append(i)
+        self.truss.remove(beam)
+        self.assertEqual((), self.truss.linked_beams(pj))
+        self.assertEqual((), self.truss.linked_beams(ps))
+
     def test_linked_forces(self):
         ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
         rs = {"type": "RollerSupport", "id": "RS1",
@@ -226,6 +375,203 @@ class TestTruss(TestCase):
         self.assertAlmostEqual(results["PS1x"], 2)
         self.assertAlmostEqual(results["PS1y"], 0)
 
+    def test_calculate_with_sparse_solver(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 0.0, "angle": 90.0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 25.0, "y": 100.0}
+        beam1 = {"type": "Beam", "id": "B1", "end1": "PJ1", "end2": "PS1"}
+        beam2 = {"type": "Beam", "id": "B2", "end1": "PJ1", "end2": "RS1"}
+        beam3 = {"type": "Beam", "id": "B3", "end1": "PS1", "end2": "RS1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": -90.0, "value": 5.0}
+        for i in (ps, rs, pj, beam1, beam2, beam3, force):
+            self.truss.append(i)
+        dense = self.truss.calculate(sparse=False)
+        sparse = self.truss.calculate(sparse=solver.sparse_available())
+        self.assertEqual(list(dense), list(sparse))
+        for name, value in dense.items():
+            self.assertAlmostEqual(value, sparse[name])
+
+    def test_calculate_load_cases(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 0.0, "angle": 90.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PS1", "end2": "RS1"}
+        for i in (ps, rs, beam):
+            self.truss.append(i)
+        wind = ({"type": "Force", "id": "F1", "applied_to": "RS1",
+                 "angle": 0, "value": 2},)
+        snow = ({"type": "Force", "id": "F1", "applied_to": "RS1",
+                 "angle": -90, "value": 3},)
+        results = self.truss.calculate_load_cases(dict(wind=wind, snow=snow))
+        self.assertEqual({"wind", "snow"}, set(results))
+        self.assertAlmostEqual(results["wind"]["B1"], 2)
+        self.assertAlmostEqual(results["wind"]["RS1"], 0)
+        self.assertAlmostEqual(results["snow"]["B1"], 0)
+        self.assertAlmostEqual(results["snow"]["RS1"], 3)
+        self.assertAlmostEqual(results["snow"]["PS1y"], 0)
+
+    def test_calculate_load_case_with_force_on_inexistent_joint(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        self.truss.append(ps)
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": 0, "value": 2}
+        with self.assertRaises(ValueError):
+            self.truss.calculate_load_cases(dict(wind=(force,)))
+
+    def test_factorization_is_reused_after_force_edit(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 0.0, "angle": 90.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PS1", "end2": "RS1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "RS1",
+                 "angle": 0, "value": 2}
+        for i in (ps, rs, beam, force):
+            self.truss.append(i)
+        with patch("solver.factorize", wraps=solver.factorize) as factorize:
+            self.truss.calculate()
+            self.truss.replace(force, {**force, "value": 3})
+            results = self.truss.calculate()
+            self.assertEqual(1, factorize.call_count)
+            self.truss.append({"type": "PinJoint", "id": "PJ1",
+                               "x": 0.0, "y": 5.0})
+            self.truss.calculate()
+            self.assertEqual(2, factorize.call_count)
+        self.assertAlmostEqual(results["B1"], 3)
+
+    def test_factorization_is_updated_after_joint_move(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 0.0, "angle": 90.0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 25.0, "y": 100.0}
+        beam1 = {"type": "Beam", "id": "B1", "end1": "PJ1", "end2": "PS1"}
+        beam2 = {"type": "Beam", "id": "B2", "end1": "PJ1", "end2": "RS1"}
+        beam3 = {"type": "Beam", "id": "B3", "end1": "PS1", "end2": "RS1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": -90.0, "value": 5.0}
+        for i in (ps, rs, pj, beam1, beam2, beam3, force):
+            self.truss.append(i)
+        self.truss.calculate()
+        moved = {**pj, "x": 10.0, "y": 30.0}
+        self.truss.replace(pj, moved)
+        with patch("solver.factorize", wraps=solver.factorize) as factorize:
+            results = self.truss.calculate()
+            self.assertEqual(0, factorize.call_count)
+        expected = Truss()
+        expected.items = self.truss.items
+        for name, value in expected.calculate().items():
+            self.assertAlmostEqual(value, results[name])
+
+    def test_influence_lines(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 0.0, "angle": 90.0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 25.0, "y": 100.0}
+        beam1 = {"type": "Beam", "id": "B1", "end1": "PJ1", "end2": "PS1"}
+        beam2 = {"type": "Beam", "id": "B2", "end1": "PJ1", "end2": "RS1"}
+        beam3 = {"type": "Beam", "id": "B3", "end1": "PS1", "end2": "RS1"}
+        for i in (ps, rs, pj, beam1, beam2, beam3):
+            self.truss.append(i)
+        lines = self.truss.influence_lines()
+        self.assertEqual(["PS1", "RS1", "PJ1"], lines.joints)
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": -90.0, "value": 1.0}
+        self.truss.append(force)
+        expected = self.truss.calculate()
+        for i, name in enumerate(lines.names):
+            self.assertAlmostEqual(expected[name], lines.matrix()[i, 2])
+        self.assertEqual(("PS1", "RS1"), lines.critical_joints()["RS1"])
+        self.assertAlmostEqual(1, lines.envelope()["RS1"][1])
+        self.truss.replace(force, {**force, "angle": 0.0})
+        expected = self.truss.calculate()
+        for i, name in enumerate(lines.names):
+            self.assertAlmostEqual(expected[name], lines.matrix((1, 0))[i, 2])
+
+    def test_sweep(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 0.0, "angle": 90.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PS1", "end2": "RS1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "RS1",
+                 "angle": 0, "value": 2}
+        for i in (ps, rs, beam, force):
+            self.truss.append(i)
+        results = self.truss.sweep({"RS1": {"angle": (90, 0, 45)},
+                                    "F1": {"value": (2, 2, 4)}})
+        self.assertEqual(["B1", "RS1", "PS1x", "PS1y"], results["names"])
+        self.assertEqual([False, True, False],
+                         list(results["indeterminate"]))
+        self.assertEqual([False, False, False], list(results["unbalanced"]))
+        for variant in (0, 2):
+            angle = (90, 0, 45)[variant]
+            value = (2, 2, 4)[variant]
+            self.truss.replace(self.truss.find_by_id("RS1"),
+                               {**rs, "angle": angle})
+            self.truss.replace(self.truss.find_by_id("F1"),
+                               {**force, "value": value})
+            expected = list(self.truss.calculate().values())
+            for i, value in enumerate(expected):
+                self.assertAlmostEqual(value, results["values"][variant, i])
+
+    def test_arrays(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        rs = {"type": "RollerSupport", "id": "RS1",
+              "x": 50.0, "y": 10.0, "angle": 90.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "RS1", "end2": "PS1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "RS1",
+                 "angle": 45, "value": 2}
+        for i in (ps, rs, beam, force):
+            self.truss.append(i)
+        arrays = self.truss.arrays
+        self.assertEqual(("PS1", "RS1"), arrays.joint_ids)
+        self.assertEqual([1, 2], arrays.kind.tolist())
+        self.assertEqual([[0, 0], [50, 10]], arrays.xy.tolist())
+        self.assertEqual(90, arrays.angle[1])
+        self.assertEqual([[1, 0]], arrays.beam_ends.tolist())
+        self.assertEqual([1], arrays.force_joint.tolist())
+        self.assertEqual(["B1", "RS1", "PS1x", "PS1y"],
+                         arrays.unknowns_names())
+        self.assertFalse(arrays.xy.flags.writeable)
+        self.assertIs(arrays, self.truss.arrays)
+        self.truss.remove(force)
+        self.assertEqual(0, len(self.truss.arrays.force_joint))
+
+    def test_arrays_are_patched_after_replacing_items(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        pj = {"type": "PinJoint", "id": "PJ1", "x": 1.0, "y": 0.0}
+        beam = {"type": "Beam", "id": "B1", "end1": "PS1", "end2": "PJ1"}
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": 45, "value": 2}
+        for i in (ps, pj, beam, force):
+            self.truss.append(i)
+        arrays = self.truss.arrays
+        with self.truss.batch():
+            self.truss.replace(pj, {**pj, "type": "RollerSupport",
+                                    "y": 2.0, "angle": 30.0})
+            self.truss.replace(force, {**force, "applied_to": "PS1",
+                                       "value": 3})
+            self.truss.replace(beam, {**beam, "end1": "PJ1", "end2": "PS1"})
+        patched = self.truss.arrays
+        self.assertIs(arrays.joint_ids, patched.joint_ids)
+        self.assertEqual([[0, 0], [1, 2]], patched.xy.tolist())
+        self.assertEqual([1, 2], patched.kind.tolist())
+        self.assertEqual(30, patched.angle[1])
+        self.assertEqual([[1, 0]], patched.beam_ends.tolist())
+        self.assertEqual(([0], [3]), (patched.force_joint.tolist(),
+                                      patched.force_value.tolist()))
+        self.assertFalse(patched.xy.flags.writeable)
+        self.assertEqual([[0, 0], [1, 0]], arrays.xy.tolist())  # unchanged
+        self.truss.replace(self.truss.find_by_id("PJ1"),
+                           {**pj, "id": "PJ2"})
+        self.assertEqual(("PS1", "PJ2"), self.truss.arrays.joint_ids)
+
+    def test_sweep_of_unknown_parameter_raises_exception(self):
+        ps = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
+        self.truss.append(ps)
+        with self.assertRaises(ValueError):
+            self.truss.sweep({"PS1": {"angle": (0, 1)}})
+
     def test_calculate_statically_undeterminate_truss_raises_exception(self):
         ps1 = {"type": "PinnedSupport", "id": "PS1", "x": 0.0, "y": 0.0}
         ps2 = {"type": "PinnedSupport", "id": "PS2", "x": 2.0, "y": 0.0}
@@ -253,14 +599,17 @@ class TestTruss(TestCase):
         callback = Mock()
         self.truss.append_observer_callback(callback)
         self.truss.new()
-        callback.assert_called_with(dict(action="truss modified"))
+        callback.assert_called_with(dict(action="truss modified", added=(),
+                                         removed=(), modified=()))
 
     def test_notify_on_append(self):
         callback = Mock()
         self.truss.append_observer_callback(callback)
         ps = dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0)
         self.truss.append(ps)
-        callback.assert_called_with(dict(action="truss modified"))
+        callback.assert_called_with(dict(action="truss modified",
+                                         added=(ps,), removed=(),
+                                         modified=()))
 
     def test_notify_on_remove(self):
         ps = dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0)
@@ -268,7 +617,8 @@ class TestTruss(TestCase):
         callback = Mock()
         self.truss.append_observer_callback(callback)
         self.truss.remove(ps)
-        callback.assert_called_with(dict(action="truss modified"))
+        callback.assert_called_with(dict(action="truss modified", added=(),
+                                         removed=(ps,), modified=()))
 
     def test_notify_on_replace(self):
         ps1 = dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0)
@@ -277,4 +627,43 @@ class TestTruss(TestCase):
         callback = Mock()
         self.truss.append_observer_callback(callback)
         self.truss.replace(ps1, ps2)
-        callback.assert_called_with(dict(action="truss modified"))
+        callback.assert_called_with(dict(action="truss modified", added=(),
+                                         removed=(), modified=((ps1, ps2),)))
+
+    def test_batch_notifies_once(self):
+        ps = dict(type="PinnedSupport", id="PS1", x=0.0, y=0.0)
+        pj1 = dict(type="PinJoint", id="PJ1", x=1.0, y=0.0)
+        pj2 = dict(type="PinJoint", id="PJ2", x=2.0, y=0.0)
+        beam = {"type": "Beam", "id": "B1", "end1": "PS1", "end2": "PJ2"}
+        self.truss.append(ps)
+        self.truss.append(pj1)
+        callback = Mock()
+        self.truss.append_observer_callback(callback)
+        with self.truss.batch():
+            self.truss.append(beam)  # is valid at the end of batch only
+            self.truss.append(pj2)
+            self.truss.remove(pj1)
+            self.truss.replace(ps, {**ps, "x": -1.0})
+        callback.assert_called_once()
+        message = callback.call_args[0][0]
+        self.assertEqual((beam, pj2), message["added"])
+        self.assertEqual((pj1,), message["removed"])
+        self.assertEqual(((ps, {**ps, "x": -1.0}),), message["modified"])
+        self.assertEqual(-1.0, self.truss.coordinates(beam)[0])
+
+    def test_batch_removes_invalid_items_at_the_end(self):
+        pj = dict(type="PinJoint", id="PJ1", x=1.0, y=0.0)
+        force = {"type": "Force", "id": "F1", "applied_to": "PJ1",
+                 "angle": 0, "value": 2}
+        callback = Mock()
+        self.truss.append_observer_callback(callback)
+        with self.truss.batch():
+            self.truss.append(pj)
+            self.truss.append(force)
+            self.truss.remove(pj)
+        self.assertEqual((), self.truss.items)
+        self.assertEqual([call(dict(action="invalid items removed",
+                                    items=(force,))),
+                          call(dict(action="truss modified", added=(),
+                                    removed=(), modified=()))],
+                         callback.call_args_list)
@@ -18,19 +18,65 @@ class TrussView(Canvas):
     LINE_COLOR = "black"
     FORCE_COLOR = "red"
     ACTIVE_COLOR = "green"
+    ZOOM_STEP = 1.2
+    MIN_BEAM_LENGTH = 1  # pixels, shorter beams are not drawn
+    DETAIL_SPACING = 40  # pixels between joints to draw supports in detail
+    RESIZE_DELAY = 100  # ms without resize events before view is fitted
+    ARRAYS_FROM = 500  # items, visibility of bigger trusses is vectorized
+    PICK_RADIUS = 6  # pixels around cursor where items are picked
+    SNAP_RADIUS = 15  # pixels around cursor where joints are snapped to
+    PREVIEW = "temporary"  # id of item being edited
 
     def __init__(self, master, truss, **kw):
         super().__init__(master, bg=self.BACKGROUND_COLOR, **kw)
-        self.bind('<Configure>', lambda _: self.refresh())
+        self.bind('<Configure>', self.__on_configure)
+        self.bind('<MouseWheel>', self.__on_wheel)
+        self.bind('<Button-4>', self.__on_wheel)
+        self.bind('<Button-5>', self.__on_wheel)
+        self.bind('<ButtonPress-3>', self.__on_drag_start)
+        self.bind('<B3-Motion>', self.__on_drag)
         self.__truss = truss
-        self.__scale = self.__get_optimal_scale()
+        self.__zoom = 1.0
+        self.__pan = (0.0, 0.0)  # pixels
+        self.__size = self.winfo_reqwidth(), self.winfo_reqheight()
+        self.__resize_job = None
+        self.__drag_start = None
+        self.__transform = self.__get_transform()
+        self.__detailed = self.__is_detailed()
+        self.__drawn = set()  # ids of items that have canvas items
+        self.__preview = None  # item being edited as it is drawn
         self.__selected = None
         self.refresh()
 
     def update_truss(self, message):
+        """
+        Redraw only items listed in "truss modified" message and items
+        linked to changed joints, move the rest if viewport changed.
+        """
         if message["action"] == "truss modified":
             self.selected = None
-            self.refresh()
+            changed = self.__changed_ids(message)
+            if len(changed) > self.__truss.items_count // 2:
+                self.__redraw()  # cheaper than many small updates
+                return
+            self.delete("Label")
+            for item_id in changed:
+                self.delete(item_id)
+            self.__drawn.difference_update(changed)
+            self.fit()  # may draw some of changed items already
+            for item_id in changed - self.__drawn:
+                self.__draw(item_id)
+            self.__raise_joints()
+
+    def __changed_ids(self, message):
+        items = [*message["added"], *message["removed"],
+                 *(i for pair in message["modified"] for i in pair)]
+        ids = {i["id"] for i in items}
+        for joint in items:
+            if Truss.is_joint(joint):
+                ids.update(i["id"] for i in self.__truss.linked_beams(joint))
+                ids.update(i["id"] for i in self.__truss.linked_forces(joint))
+        return ids
 
     @property
     def selected(self):
@@ -43,26 +89,232 @@ class TrussView(Canvas):
         self.highlight(self.__selected)
 
     def refresh(self):
+        """Fit whole truss to view (reset zoom and pan) and redraw it."""
+        self.__zoom = 1.0
+        self.__pan = (0.0, 0.0)
+        self.__redraw()
+
+    def zoom(self, factor, x, y):
+        """Zoom by factor keeping point x, y of canvas in place."""
+        # distances from point to fitted truss origin are scaled by factor
+        x_offset = self.X_OFFSET
+        y_offset = self.__size[1] - self.Y_OFFSET
+        pan_x, pan_y = self.__pan
+        self.__zoom *= factor
+        self.__pan = (x - x_offset - (x - x_offset - pan_x) * factor,
+                      y - y_offset - (y - y_offset - pan_y) * factor)
+        self.fit()
+
+    def pan(self, dx, dy):
+        """Move view by dx, dy pixels."""
+        self.__pan = (self.__pan[0] + dx, self.__pan[1] + dy)
+        self.fit()
+
+    def fit(self):
+        """
+        Fit truss to view taking zoom and pan into account. Items that
+        stay visible are moved and scaled with canvas operations: beams are
+        scaled, symbols of joints and forces keep their size and are moved
+        only. Items that left the view are deleted, items that came into
+        view are drawn. Labels are removed.
+        """
+        old = self.__transform
+        self.__transform = new = self.__get_transform()
+        if new == old:
+            return
+        self.delete("Label")
+        self.hide_preview()  # it is drawn again on next mouse move
+        if self.__is_detailed() != self.__detailed or old[0] * new[0] <= 0:
+            self.__redraw()  # all joints change their symbols
+            return
+        ratio = new[0] / old[0]
+        # canvas position p of any point becomes p * ratio + offset
+        dx, dy = new[1] - ratio * old[1], new[2] - ratio * old[2]
+        if ratio == 1:
+            self.move("all", dx, dy)
+        else:
+            self.scale("Beam", 0, 0, ratio, ratio)
+            self.move("Beam", dx, dy)
+            for item_id in self.__drawn:
+                item = self.__truss.find_by_id(item_id)
+                if item["type"] != "Beam":
+                    x, y = self.to_canvas_pos(
+                        *self.__truss.coordinates(item), old)
+                    self.move(item_id, x * (ratio - 1) + dx,
+                              y * (ratio - 1) + dy)
+        self.__cull()
+
+    def __cull(self):
+        """Delete items that are not visible, draw ones that became so."""
+        visible = self.__visible_ids()
+        for item_id in self.__drawn - visible:
+            self.delete(item_id)
+        self.__drawn &= visible
+        for item_id in visible - self.__drawn:
+            self.__draw(item_id)
+        self.__raise_joints()
+
+    def __redraw(self):
+        self.__transform = self.__get_transform()  # truss may have changed
         self.delete("all")
-        self.__scale = self.__get_optimal_scale()
-        for i in self.__truss:
-            self.create_item(i)
+        self.__drawn.clear()
+        self.__preview = None
+        self.__detailed = self.__is_detailed()
+        for item_id in self.__visible_ids():
+            self.__draw(item_id)
+        self.__raise_joints()
+        self.highlight(self.selected)
+
+    def __draw(self, item_id):
+        """Draw visible items with given id (there may be duplicates)."""
+        for item in self.__truss.find_all_by_id(item_id):
+            if self.__is_visible(item):
+                self.create_item(item)
+                self.__drawn.add(item_id)
+
+    def __visible_ids(self):
+        """Return ids of visible items (see __is_visible)."""
+        if len(self.__truss.items) < self.ARRAYS_FROM:
+            return {i["id"] for i in self.__truss if self.__is_visible(i)}
+        model = self.__truss.arrays
+        width, height = self.__size
+        margin = self.FORCE_LENGTH + 10
+        xy = self.to_canvas_array(model.xy)
+        x, y = xy[:, 0], xy[:, 1]
+        joints = (x >= -margin) & (x <= width + margin) & \
+            (y >= -margin) & (y <= height + margin)
+        ends = xy[model.beam_ends]  # beam, end, coordinate
+        low, high = ends.min(axis=1), ends.max(axis=1)
+        beams = (high[:, 0] >= 0) & (low[:, 0] <= width) & \
+            (high[:, 1] >= 0) & (low[:, 1] <= height) & \
+            ((high - low).sum(axis=1) >= self.MIN_BEAM_LENGTH)
+        forces = joints[model.force_joint]
+        return {*(model.joint_ids[i] for i in joints.nonzero()[0]),
+                *(model.beam_ids[i] for i in beams.nonzero()[0]),
+                *(model.force_ids[i] for i in forces.nonzero()[0])}
+
+    def __is_visible(self, item):
+        """Check if item is in view and is not too short beam."""
+        width, height = self.__size
+        margin = self.FORCE_LENGTH + 10
+        coordinates = self.__truss.coordinates(item)
+        if item["type"] != "Beam":
+            x, y = self.to_canvas_pos(*coordinates)
+            return -margin <= x <= width + margin and \
+                -margin <= y <= height + margin
+        x1, y1 = self.to_canvas_pos(*coordinates[:2])
+        x2, y2 = self.to_canvas_pos(*coordinates[2:])
+        return max(x1, x2) >= 0 and min(x1, x2) <= width and \
+            max(y1, y2) >= 0 and min(y1, y2) <= height and \
+            abs(x2 - x1) + abs(y2 - y1) >= self.MIN_BEAM_LENGTH
+
+    def __is_detailed(self):
+        """Check if joints are far enough apart to draw them in detail."""
+        if self.__truss.joints_count < 2:
+            return True
+        return self.__truss.spacing * self.__transform[0] >= \
+            self.DETAIL_SPACING
+
+    def item_at(self, x, y):
+        """
+        Return item at canvas position x, y or None: joint nearest to it,
+        force under cursor or beam nearest to it. Joints and beams are
+        found with spatial index of truss, not with canvas.
+        """
+        joint = self.joint_at(x, y, self.PICK_RADIUS)
+        if joint:
+            return joint
+        for canvas_item in self.find_withtag("current"):
+            tags = self.gettags(canvas_item)
+            if tags[0] == "Force" and self.__truss.find_by_id(tags[1]):
+                return self.__truss.find_by_id(tags[1])
+        truss_x, truss_y = self.to_truss_pos(x, y)
+        return self.__truss.hit_beam(truss_x, truss_y,
+                                     self.PICK_RADIUS / self.__transform[0])
+
+    def joint_at(self, x, y, radius=SNAP_RADIUS):
+        """Return joint nearest to canvas position within radius pixels."""
+        truss_x, truss_y = self.to_truss_pos(x, y)
+        return self.__truss.nearest_joint(truss_x, truss_y,
+                                          radius / self.__transform[0])
+
+    def __on_configure(self, event):
+        """Fit view once resizing pauses, not on every resize event."""
+        self.__size = event.width, event.height
+        if self.__resize_job is not None:
+            self.after_cancel(self.__resize_job)
+        self.__resize_job = self.after(self.RESIZE_DELAY, self.__on_resized)
+
+    def __on_resized(self):
+        self.__resize_job = None
+        self.fit()
+
+    def __on_wheel(self, event):
+        zoom_in = event.num == 4 or getattr(event, "delta", 0) > 0
+        factor = self.ZOOM_STEP if zoom_in else 1 / self.ZOOM_STEP
+        self.zoom(factor, event.x, event.y)
+
+    def __on_drag_start(self, event):
+        self.__drag_start = event.x, event.y
+
+    def __on_drag(self, event):
+        x, y = self.__drag_start
+        self.__drag_start = event.x, event.y
+        self.pan(event.x - x, event.y - y)
+
+    def show_preview(self, item):
+        """
+        Show item being edited. Canvas items of previous preview are moved
+        to new position instead of being created again when possible.
+        """
+        old, new = self.__preview, {**item, "id": self.PREVIEW}
+        self.__preview = new
+        if old is None or old["type"] != new["type"] or \
+                old.get("angle") != new.get("angle") and \
+                new["type"] == "RollerSupport":
+            self.delete(self.PREVIEW)
+            self.create_item(new)
+            self.tag_lower(self.PREVIEW)
+        elif new["type"] == "Beam":
+            coordinates = self.__truss.coordinates(new)
+            self.coords(self.PREVIEW,
+                        *self.to_canvas_pos(*coordinates[:2]),
+                        *self.to_canvas_pos(*coordinates[2:]))
+        elif new["type"] == "Force":
+            self.coords(self.PREVIEW, *self.__force_coords(new))
+        else:
+            x1, y1 = self.to_canvas_pos(old["x"], old["y"])
+            x2, y2 = self.to_canvas_pos(new["x"], new["y"])
+            self.move(self.PREVIEW, x2 - x1, y2 - y1)
+
+    def hide_preview(self):
+        if self.__preview is not None:
+            self.delete(self.PREVIEW)
+            self.__preview = None
+
+    def __raise_joints(self):
         for i in ("Force", "PinJoint", "PinnedSupport", "RollerSupport"):
             self.tag_raise(i)
-        self.highlight(self.selected)
 
-    def __get_optimal_scale(self):
+    def __get_transform(self):
+        """Return scale and canvas position of truss origin."""
         width = self.__truss.width
         height = self.__truss.height
-        self.update()
-        view_width = self.winfo_width() - 2 * self.X_OFFSET
-        view_height = self.winfo_height() - 2 * self.Y_OFFSET
+        view_width = self.__size[0] - 2 * self.X_OFFSET
+        view_height = self.__size[1] - 2 * self.Y_OFFSET
         x_scale = view_width / width if width else view_width
         y_scale = view_height / height if height else view_height
-        return min(x_scale, y_scale)
+        scale = min(x_scale, y_scale) * self.__zoom
+        x0 = self.X_OFFSET - self.__truss.left * scale + self.__pan[0]
+        y0 = self.__size[1] - self.Y_OFFSET + self.__truss.bottom * scale + \
+            self.__pan[1]
+        return scale, x0, y0
 
     def create_item(self, i):
-        create = getattr(self, f"create_{camel_to_snake(i['type'])}")
+        if Truss.is_joint(i) and not self.__detailed:
+            create = self.create_marker
+        else:
+            create = getattr(self, f"create_{camel_to_snake(i['type'])}")
         create(i, self.get_color(i), self.ACTIVE_COLOR)
 
     def get_color(self, item):
@@ -83,6 +335,17 @@ class TrussView(Canvas):
                          tags=tags, width=2, outline=color,
                          fill=self.BACKGROUND_COLOR, activefill=activefill)
 
+    def create_marker(self, j, color, activefill):
+        """Draw joint of any type as one small item."""
+        x, y = self.to_canvas_pos(j["x"], j["y"])
+        tags = j["type"], j["id"]
+        if j["type"] == "PinJoint":
+            self.create_circle(x, y, 2, color, activefill, tags)
+        else:
+            self.create_rectangle(x - 3, y - 3, x + 3, y + 3, tags=tags,
+                                  outline=color, fill=color,
+                                  activefill=activefill)
+
     def create_pin_joint(self, pj, color, activefill):
         x, y = self.to_canvas_pos(pj["x"], pj["y"])
         self.create_circle(x, y, 4, color, activefill, ("PinJoint", pj["id"]))
@@ -127,52 +390,55 @@ class TrussView(Canvas):
         self.create_circle(x, y, r, color, activefill=activecolor, tags=tags)
 
     def create_beam(self, b, color, activecolor):
-        end1 = self.to_canvas_pos(b["x1"], b["y1"])
-        end2 = self.to_canvas_pos(b["x2"], b["y2"])
+        coordinates = self.__truss.coordinates(b)
+        end1 = self.to_canvas_pos(*coordinates[:2])
+        end2 = self.to_canvas_pos(*coordinates[2:])
         self.create_line(*end1, *end2, tags=("Beam", b["id"]), width=2,
                          fill=color, activefill=activecolor)
 
     def create_force(self, f, color, activecolor):
-        x2, y2 = self.to_canvas_pos(f["x"], f["y"])
-        x1, y1 = rotate((x2, y2), (x2 + self.FORCE_LENGTH, y2), f["angle"])
+        self.create_line(*self.__force_coords(f), tags=("Force", f["id"]),
+                         width=2, arrow=LAST, fill=color,
+                         activefill=activecolor)
 
-        self.create_line(x1, y1, x2, y2, tags=("Force", f["id"]), width=2,
-                         arrow=LAST, fill=color, activefill=activecolor)
+    def __force_coords(self, f):
+        """Return start and end (at joint) of force arrow."""
+        x2, y2 = self.to_canvas_pos(*self.__truss.coordinates(f))
+        x1, y1 = rotate((x2, y2), (x2 + self.FORCE_LENGTH, y2), f["angle"])
+        return x1, y1, x2, y2
 
     def create_labels(self):
         for item in self.__truss:
-            if item["type"] != "PinJoint":
+            if item["type"] != "PinJoint" and item["id"] in self.__drawn:
                 self.create_label(item)
 
     def create_label(self, i):
-        x = y = 0
+        coordinates = self.__truss.coordinates(i)
         if i["type"] == "Beam":
-            x, y = self.to_canvas_pos((i["x1"] + i["x2"]) / 2,
-                                      (i["y1"] + i["y2"]) / 2)
+            x1, y1, x2, y2 = coordinates
+            x, y = self.to_canvas_pos((x1 + x2) / 2, (y1 + y2) / 2)
+        else:
+            x, y = self.to_canvas_pos(*coordinates)
         if i["type"] == "Force":
-            x, y = self.to_canvas_pos(i["x"], i["y"])
             x, y = rotate((x, y), (x + self.FORCE_LENGTH / 2, y), i["angle"])
-        if Truss.is_joint(i):
-            x, y = self.to_canvas_pos(i["x"], i["y"])
         t = self.create_text(x, y, text=i["id"], tags="Label", font="Arial 10",
                              fill=self.LABEL_COLOR)
         b = self.create_rectangle(self.bbox(t), fill=self.BACKGROUND_COLOR,
                                   outline=self.BACKGROUND_COLOR, tags="Label")
         self.tag_lower(b, t)
 
-    def to_canvas_pos(self, x, y):
-        rx = x - self.__truss.left
-        canvas_x = rx * self.__scale + self.X_OFFSET
-        ry = y - self.__truss.bottom
-        canvas_y = int(self.winfo_height()) - self.Y_OFFSET - ry * self.__scale
-        return canvas_x, canvas_y
+    def to_canvas_pos(self, x, y, transform=None):
+        scale, x0, y0 = transform or self.__transform
+        return x * scale + x0, y0 - y * scale
+
+    def to_canvas_array(self, xy):
+        """Convert NumPy array of truss points (N x 2) at once."""
+        scale, x0, y0 = self.__transform
+        return xy * (scale, -scale) + (x0, y0)
 
     def to_truss_pos(self, x, y):
-        rx = (x - self.X_OFFSET) / self.__scale
-        truss_x = rx + self.__truss.left
-        ry = (int(self.winfo_height()) - self.Y_OFFSET - y) / self.__scale
-        truss_y = ry + self.__truss.bottom
-        return truss_x, truss_y
+        scale, x0, y0 = self.__transform
+        return (x - x0) / scale, (y0 - y) / scale
 
 
 class ItemEditState():
@@ -185,6 +451,22 @@ class ItemEditState():
         self.__item = None
         self.__state = self._process_default
 
+    @property
+    def idle(self):
+        """Check if no item is being created, edited or is selected."""
+        return self.__state == self._process_default and self.__item is None
+
+    @property
+    def placing_node(self):
+        """Check if joint beam end or force is attached to is being chosen."""
+        if self.__state != self._edit_item:
+            return False
+        if self.__item["type"] == "Beam":
+            return self.__item.get("end1") is None or \
+                self.__item.get("end2") is None
+        return self.__item["type"] == "Force" and \
+            self.__item.get("applied_to") is None
+
     def new(self, item_type):
         self.__item = dict(type=item_type)
         self.__state = self._edit_item
@@ -203,7 +485,7 @@ class ItemEditState():
             ret = dict(action="select", item=self.__item)
         elif msg["action"] == "click":
             self.__item = None
-            ret = dict(action="cancel")
+            ret = dict(action="deselect")
         elif msg["action"] == "delete":
             ret = dict(action="delete", item=self.__item)
             self.__item = None
@@ -270,11 +552,16 @@ class ItemEditState():
         return dict(action="update tmp", item={**self.__item, "angle": angle})
 
     def _specify_node(self, node, x, y, msg):
-        self.__item.update({x: msg["x"], y: msg["y"]})
-        if msg["action"] == "item click" and Truss.is_joint(msg["item"]):
-            j = msg["item"]
-            self.__item.update({node: j["id"], x: j["x"], y: j["y"]})
-            return self._edit_item({**msg, "action": "move"})
+        """Joint passed as item of "move" message is snapped to."""
+        j = msg.get("item")
+        if j is not None and Truss.is_joint(j):
+            self.__item.update({x: j["x"], y: j["y"]})
+            if msg["action"] == "item click":
+                self.__item[node] = j["id"]
+                return self._edit_item({**msg, "action": "move",
+                                        "item": None})
+        else:
+            self.__item.update({x: msg["x"], y: msg["y"]})
         return dict(action="update tmp", item=self.__item)
 
 
@@ -282,20 +569,26 @@ class PropertyEditor(Frame):
     def __init__(self, master, **kw):
         super().__init__(master, **kw)
         self.__variables = {}
+        self.__commands = {}  # property name or "OK", "Cancel" -> callback
 
     def show(self, properties, ok, cancel):
-        new_vars = {p["name"]: StringVar(value=p["value"]) for p in properties}
-        if self.__variables.keys() == new_vars.keys():
-            for name, var in new_vars.items():
-                self.__variables[name].set(var.get())
+        """
+        Show properties. If names of properties are the same as shown ones,
+        existing widgets are reused and only values that differ from shown
+        ones (as typed by user, if editable) are updated.
+        """
+        if list(self.__variables) == [p["name"] for p in properties]:
             self.__update_widgets(properties)
         else:
             self.clear()
-            self.__variables = new_vars
-            self.__create_widgets(properties, ok, cancel)
+            self.__variables = {p["name"]: StringVar(value=p["value"])
+                                for p in properties}
+            self.__create_widgets(properties)
+        self.__commands = {p["name"]: p.get("command") for p in properties}
+        self.__commands.update(OK=ok, Cancel=cancel)
         return self.__variables
 
-    def __create_widgets(self, properties, ok, cancel):
+    def __create_widgets(self, properties):
         o = dict(padx=5, pady=5, sticky=W+E+N+S)
         i = 0
         for p in properties:
@@ -303,24 +596,36 @@ class PropertyEditor(Frame):
             Label(self, text=name).grid(column=0, row=i, **o)
             if p.get("command"):
                 w = Button(self, name=camel_to_snake(name),
-                           text=p["value"], command=p["command"])
+                           text=p["value"], command=self.__command(name))
             elif p.get("editable"):
                 w = Entry(self, textvariable=self.__variables[name])
             else:
-                w = Label(self, text=p["value"])
+                w = Label(self, textvariable=self.__variables[name])
             w.grid(column=1, row=i, **o)
             i += 1
-        Button(self, text="OK", command=ok).grid(column=0, row=i, **o)
-        Button(self, text="Cancel", command=cancel).grid(column=1, row=i, **o)
+        Button(self, text="OK", command=self.__command("OK")
+               ).grid(column=0, row=i, **o)
+        Button(self, text="Cancel", command=self.__command("Cancel")
+               ).grid(column=1, row=i, **o)
+
+    def __command(self, name):
+        """Return callback calling the latest command given for name."""
+        return lambda: self.__commands[name]()
 
     def __update_widgets(self, properties):
         for p in properties:
+            name, value = p["name"], p.get("value")
+            text = str(value) if value is not None else ""
             if p.get("command"):
-                btn = self.nametowidget(camel_to_snake(p["name"]))
-                btn["text"] = p["value"] if p.get("value") is not None else ""
+                btn = self.nametowidget(camel_to_snake(name))
+                if str(btn["text"]) != text:
+                    btn["text"] = text
+            elif self.__variables[name].get() != text:
+                self.__variables[name].set(text)
 
     def clear(self):
         self.__variables = {}
+        self.__commands = {}
         for child in self.winfo_children():
             child.destroy()
         Frame(self).grid()  # hack to hide empty instance
@@ -435,6 +740,15 @@ class TrussPropertyEditor(PropertyEditor, Observable):
             p.append({"name": n, "value": f"{v:>.4f}", "editable": False})
         self.show(properties=p, ok=self.cancel, cancel=self.cancel)
 
+    def show_error(self, error):
+        p = [{"name": "Error", "value": str(error), "editable": False}]
+        self.show(properties=p, ok=self.cancel, cancel=self.cancel)
+
+    def show_progress(self, stage):
+        """Show stage of running calculation, Cancel button stops it."""
+        p = [{"name": "Calculating", "value": stage, "editable": False}]
+        self.show(properties=p, ok=self.clear, cancel=self.cancel)
+
     def cancel(self):
         self.notify(dict(action="cancel"))
 